@@ -8,6 +8,8 @@ from fastapi.responses import FileResponse
 
 from .db import Base, engine
 from .routes import content, ai, quiz, students, sync
+from .services.ollama_async import close_ollama_client, get_ollama_client
+from .services.rag_engine import start_rag_warmup
 
 Base.metadata.create_all(bind=engine)
 
@@ -20,6 +22,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def warm_up_rag():
+    # Load the embedding model + FAISS index in the background; until then
+    # retrieval is keyword-only and /ai/health reports vectors_ready=false
+    start_rag_warmup()
+
+
+@app.on_event("startup")
+async def bind_ollama_client():
+    # Bind the shared Ollama client to the server loop so sync routes can use it
+    get_ollama_client()
+
+
+@app.on_event("shutdown")
+async def close_ollama():
+    await close_ollama_client()
+
+
 app.include_router(content.router)
 app.include_router(ai.router)
 app.include_router(quiz.router)
@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
 import re
+from typing import Any, AsyncIterable
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from ..schemas import ExplainRequest, ExplainResponse, ChatRequest, ChatResponse
+from ..services.answer_cache import get_answer_cache
 from ..services.content_engine import ContentEngine
-from ..services.ollama_client_enhanced import ollama_generate, check_ollama_health
+from ..services.ollama_client_enhanced import (
+    check_ollama_health,
+    generation_flight,
+    ollama_generate,
+    ollama_generate_stream,
+)
+from ..services.llm_scheduler import generation_scheduler
 from ..services.rag_engine import get_rag_engine
 from ..utils.lang import pick_lang
 
@@ -58,8 +69,31 @@ def _fallback_from_context(lang: str, context_text: str) -> str:
     return "Summary: " + " ".join(summary_lines)
 
 
-@router.post("/explain", response_model=ExplainResponse)
-def explain(req: ExplainRequest):
+def _sse(events: AsyncIterable[tuple[str, dict[str, Any]]]) -> StreamingResponse:
+    """Server-Sent Events response from (event, data) pairs"""
+    async def encode():
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    # no-cache / X-Accel-Buffering keep proxies from buffering the stream
+    return StreamingResponse(
+        encode(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _offline_events(reply: str):
+    yield "replace", {"text": reply}
+    yield "done", {"reply": reply, "model": "offline", "first_token_ms": None, "cached": False}
+
+
+def _explain_prompt(req: ExplainRequest) -> tuple[str, str]:
+    """
+    (text to explain, user prompt); the text is empty when there is nothing to explain
+
+    Blocking (lesson lookup, context retrieval): async routes run it in the threadpool.
+    """
     lesson_text = ""
     if req.lesson_id:
         lesson = engine.get_lesson(req.lesson_id)
@@ -68,10 +102,8 @@ def explain(req: ExplainRequest):
 
     user_text = req.text or lesson_text
     if not user_text:
-        reply = pick_lang("பாடத்தை தேர்ந்தெடுக்கவும்.", "Please choose a lesson.", req.language)
-        return ExplainResponse(reply=reply, model="offline")
+        return "", ""
 
-    system_prompt = _load_system_prompt(req.language)
     context = engine.retrieve_context(req.grade, req.subject, req.language, user_text)
 
     user_prompt = (
@@ -83,8 +115,19 @@ def explain(req: ExplainRequest):
         "Explain simply with short sentences and a small story example."
         "Answer clearly and include the final answer after 'பதில்:' if it is a direct question."
     )
+    return user_text, user_prompt
+
 
-    response, model = ollama_generate(
+@router.post("/explain", response_model=ExplainResponse)
+async def explain(req: ExplainRequest):
+    user_text, user_prompt = await run_in_threadpool(_explain_prompt, req)
+    if not user_text:
+        reply = pick_lang("பாடத்தை தேர்ந்தெடுக்கவும்.", "Please choose a lesson.", req.language)
+        return ExplainResponse(reply=reply, model="offline")
+
+    system_prompt = _load_system_prompt(req.language)
+
+    response, model = await ollama_generate(
         system_prompt, 
         user_prompt, 
         grade=req.grade,
@@ -103,8 +146,25 @@ def explain(req: ExplainRequest):
     return ExplainResponse(reply=response.strip(), model=model)
 
 
+@router.post("/explain/stream")
+async def explain_stream(req: ExplainRequest):
+    """/explain as Server-Sent Events (start, token..., optional replace, done)"""
+    user_text, user_prompt = await run_in_threadpool(_explain_prompt, req)
+    if not user_text:
+        return _sse(_offline_events(pick_lang("பாடத்தை தேர்ந்தெடுக்கவும்.", "Please choose a lesson.", req.language)))
+
+    return _sse(ollama_generate_stream(
+        _load_system_prompt(req.language),
+        user_prompt,
+        grade=req.grade,
+        subject=req.subject,
+        lang=req.language,
+        use_rag=True
+    ))
+
+
 @router.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     if not req.message.strip():
         reply = pick_lang("கேள்வி கேளுங்கள்.", "Please ask a question.", req.language)
         return ChatResponse(reply=reply, model="offline")
@@ -112,7 +172,7 @@ def chat(req: ChatRequest):
     system_prompt = _load_system_prompt(req.language)
     
     # RAG disabled - enable ONLY after indexing your PDFs
-    response, model = ollama_generate(
+    response, model = await ollama_generate(
         system_prompt,
         req.message,
         grade=req.grade,
@@ -132,10 +192,32 @@ def chat(req: ChatRequest):
     return ChatResponse(reply=response.strip(), model=model)
 
 
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """/chat as Server-Sent Events (start, token..., optional replace, done)"""
+    if not req.message.strip():
+        return _sse(_offline_events(pick_lang("கேள்வி கேளுங்கள்.", "Please ask a question.", req.language)))
+
+    return _sse(ollama_generate_stream(
+        _load_system_prompt(req.language),
+        req.message,
+        grade=req.grade,
+        subject=req.subject,
+        lang=req.language,
+        use_rag=False  # Same as /chat
+    ))
+
+
 @router.get("/health")
-def ai_health():
+async def ai_health():
     """Check AI system health"""
-    return check_ollama_health()
+    health = await check_ollama_health()
+    health["rag"] = await run_in_threadpool(lambda: get_rag_engine().status())
+    cache = get_answer_cache()
+    health["answer_cache"] = await run_in_threadpool(cache.stats) if cache is not None else None
+    health["coalescing"] = generation_flight.stats()
+    health["scheduler"] = generation_scheduler.stats()
+    return health
     if not req.message.strip():
         return ChatResponse(reply="", model="offline", used_subject=req.subject, used_grade=req.grade)
 
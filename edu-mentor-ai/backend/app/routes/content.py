@@ -2,8 +2,9 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Query
 
-from ..schemas import LessonItem, LessonOut
+from ..schemas import LessonItem, LessonOut, RelatedLessonItem
 from ..services.content_engine import ContentEngine
+from ..services.rag_engine import RAG_RELATED_K, get_rag_engine
 
 router = APIRouter(prefix="/content", tags=["content"])
 engine = ContentEngine()
@@ -39,3 +40,9 @@ def get_lesson(lesson_id: str):
             summary="",
         )
     return LessonOut(**lesson)
+
+
+@router.get("/lesson/{lesson_id}/related", response_model=list[RelatedLessonItem])
+def related_lessons(lesson_id: str, limit: int = Query(default=RAG_RELATED_K, ge=1, le=20)):
+    # Precomputed at index time: one SQLite lookup, no embedding or FAISS work
+    return [RelatedLessonItem(**lesson) for lesson in get_rag_engine().related(lesson_id, limit)]
@@ -29,6 +29,10 @@ class LessonItem(BaseModel):
     summary: str
 
 
+class RelatedLessonItem(LessonItem):
+    score: float
+
+
 class LessonOut(BaseModel):
     lesson_id: str
     grade: int
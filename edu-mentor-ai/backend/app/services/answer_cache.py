@@ -0,0 +1,146 @@
+"""
+Persistent cache of LLM answers
+
+At temperature 0.2 with curriculum-bound prompts, repeated questions (every
+Explain of the same lesson and grade) produce effectively the same answer.
+Answers are stored in SQLite keyed by a hash of everything that determines
+the generation: model, system prompt, final prompt (including the RAG
+context, so an index change yields new keys) and sampling options. Entries
+expire after a TTL, and the least recently used are trimmed past a row limit.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .rag_engine import DATA_DIR
+
+
+OLLAMA_CACHE = os.getenv("OLLAMA_CACHE", "1") == "1"
+OLLAMA_CACHE_PATH = Path(os.getenv("OLLAMA_CACHE_PATH", str(DATA_DIR / "answer_cache.db")))
+OLLAMA_CACHE_TTL = float(os.getenv("OLLAMA_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds
+OLLAMA_CACHE_MAX_ENTRIES = int(os.getenv("OLLAMA_CACHE_MAX_ENTRIES", "5000"))
+
+
+def answer_key(model: str, system: str | None, prompt: str, options: dict[str, Any] | None) -> str:
+    """sha256 of the generation inputs"""
+    payload = json.dumps([model, system or "", prompt, options or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """SQLite answer cache with TTL expiry and LRU trimming"""
+
+    TRIM_EVERY = 100  # Writes between LRU trims
+
+    def __init__(
+        self,
+        path: Path = OLLAMA_CACHE_PATH,
+        ttl: float = OLLAMA_CACHE_TTL,
+        max_entries: int = OLLAMA_CACHE_MAX_ENTRIES
+    ):
+        """
+        Args:
+            path: SQLite file
+            ttl: Seconds an answer stays valid
+            max_entries: Rows kept before the least recently used are trimmed
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection, serialized by _lock (lookups are a primary-key read)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS answer_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_last_used ON answer_cache(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        """Cached answer for a key, or None (missing or expired)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM answer_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE answer_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        """Store a generated answer (only safe, non-fallback answers should be stored)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answer_cache (key, model, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            self._writes += 1
+            if self._writes % self.TRIM_EVERY == 0:
+                self._conn.execute("DELETE FROM answer_cache WHERE created_at < ?", (now - self.ttl,))
+                self._conn.execute("""
+                    DELETE FROM answer_cache WHERE rowid IN (
+                        SELECT rowid FROM answer_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answer_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters since startup"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM answer_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_answer_cache: AnswerCache | None = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache | None:
+    """Shared answer cache, or None when OLLAMA_CACHE=0"""
+    global _answer_cache
+    if not OLLAMA_CACHE:
+        return None
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache()
+        return _answer_cache
@@ -0,0 +1,188 @@
+"""
+Embedding backends for the RAG engine
+
+Every backend exposes the SentenceTransformer-style call the engine uses:
+    encode(texts, batch_size=32, normalize_embeddings=True, show_progress_bar=False)
+and returns a float32 array of shape (len(texts), dim).
+
+Backends (RAG_EMBEDDER):
+    sentence-transformers   PyTorch model, the reference implementation
+    onnx-int8               int8-quantized ONNX Runtime model, no torch needed at runtime
+                            (export once with tools/export_onnx_embedder.py)
+    hash                    feature hashing of words, no model at all; for benchmarks and
+                            offline testing only (lexical, not semantic)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Protocol
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+EMBEDDER_BACKENDS = ("sentence-transformers", "onnx-int8", "hash")
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_TOKENIZER_FILE = "tokenizer.json"
+
+
+class Embedder(Protocol):
+    """Text embedding backend"""
+
+    dim: int
+
+    def encode(
+        self,
+        texts: list[str],
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        show_progress_bar: bool = False,
+    ):
+        ...
+
+
+class SentenceTransformerEmbedder:
+    """PyTorch SentenceTransformer (imports torch when constructed)"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(
+        self,
+        texts: list[str],
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        show_progress_bar: bool = False,
+    ):
+        return np.asarray(self.model.encode(
+            texts,
+            batch_size=batch_size,
+            normalize_embeddings=normalize_embeddings,
+            show_progress_bar=show_progress_bar,
+        ), dtype=np.float32)
+
+
+class OnnxInt8Embedder:
+    """int8-quantized transformer on ONNX Runtime with mean pooling (matches MiniLM sentence-transformers)"""
+
+    def __init__(self, model_dir: Path, max_seq_length: int = 128, threads: int = 0):
+        """
+        Args:
+            model_dir: Directory with model.onnx and tokenizer.json
+            max_seq_length: Token limit (128, as in the sentence-transformers config)
+            threads: ONNX Runtime intra-op threads (0 = runtime default)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = model_dir / ONNX_MODEL_FILE
+        tokenizer_path = model_dir / ONNX_TOKENIZER_FILE
+        if not model_path.exists() or not tokenizer_path.exists():
+            raise FileNotFoundError(
+                f"ONNX embedder not found in {model_dir}. Run: python tools/export_onnx_embedder.py"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def encode(
+        self,
+        texts: list[str],
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        show_progress_bar: bool = False,
+    ):
+        batches = []
+        # Sort by length so each padded batch wastes as little compute as possible
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            batches.append((rows, self._encode_batch([texts[i] for i in rows])))
+
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for rows, vectors in batches:
+            embeddings[rows] = vectors
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings
+
+    def _encode_batch(self, texts: list[str]):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real (non-padding) tokens
+        mask = attention_mask[..., None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words feature hashing (stand-in model for benchmarks)"""
+
+    _WORD = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(
+        self,
+        texts: list[str],
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        show_progress_bar: bool = False,
+    ):
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in self._WORD.findall(text.casefold()):
+                digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                embeddings[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings
+
+
+def create_embedder(backend: str, model_name: str, onnx_model_dir: Path) -> Embedder:
+    """
+    Build the configured embedding backend
+
+    Args:
+        backend: One of EMBEDDER_BACKENDS
+        model_name: SentenceTransformer model id
+        onnx_model_dir: Exported ONNX model directory (onnx-int8 backend)
+    """
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbedder(model_name)
+    if backend == "onnx-int8":
+        return OnnxInt8Embedder(onnx_model_dir)
+    if backend == "hash":
+        return HashingEmbedder()
+    raise ValueError(f"Unknown embedder backend {backend!r}, expected one of {EMBEDDER_BACKENDS}")
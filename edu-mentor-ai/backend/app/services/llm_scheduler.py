@@ -0,0 +1,229 @@
+"""
+Admission-controlled priority scheduler for Ollama generations
+
+Ollama on a small machine runs about one generation at a time, and requests
+sent to it pile up until they time out. Generations instead take one of
+OLLAMA_CONCURRENCY slots, waiting in a priority queue (interactive requests
+ahead of batch work, then first come first served). Each request has a queue
+deadline: when the predicted wait already exceeds it the request is shed at
+once (the caller answers with its fallback message), and a request still
+queued when its deadline passes is shed too, so waits stay bounded under load.
+
+The predicted wait uses a moving average of recent generation times.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+
+OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "1"))  # Generations Ollama runs at once
+OLLAMA_EXPECTED_SECONDS = float(os.getenv("OLLAMA_EXPECTED_SECONDS", "20"))  # Until generations are measured
+OLLAMA_INTERACTIVE_DEADLINE = float(os.getenv("OLLAMA_INTERACTIVE_DEADLINE", "30"))  # Max queue wait, seconds
+OLLAMA_BATCH_DEADLINE = float(os.getenv("OLLAMA_BATCH_DEADLINE", "600"))
+
+PRIORITY_INTERACTIVE = 0  # A student is waiting (chat, explain)
+PRIORITY_BATCH = 1  # Background and pre-generation work
+
+DEFAULT_DEADLINES = {
+    PRIORITY_INTERACTIVE: OLLAMA_INTERACTIVE_DEADLINE,
+    PRIORITY_BATCH: OLLAMA_BATCH_DEADLINE,
+}
+
+SERVICE_TIME_SMOOTHING = 0.2  # Weight of the latest generation in the moving average
+
+
+class Overloaded(Exception):
+    """A generation could not start before its queue deadline"""
+
+
+class Ticket:
+    """A generation's place in the scheduler: queued, then running until released"""
+
+    def __init__(self, scheduler: GenerationScheduler, priority: int, deadline: float, seq: int):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.deadline_at = time.monotonic() + deadline
+        self.seq = seq
+        self.started_at: float | None = None
+        self.admitted = asyncio.get_running_loop().create_future()
+
+    def __lt__(self, other: Ticket) -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    async def queue_updates(self) -> AsyncIterator[tuple[int, float]]:
+        """
+        (queue position, estimated wait in seconds) whenever the position changes
+
+        Returns once a slot is granted; raises Overloaded when the deadline passes first.
+        """
+        last_position = None
+        while not self.admitted.done():
+            position, wait = self.scheduler.position(self)
+            if position != last_position:
+                last_position = position
+                yield position, wait
+                continue  # The queue may have moved while the update was consumed
+
+            remaining = self.deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.scheduler.shed(self)
+                raise Overloaded("queue deadline passed")
+            await asyncio.wait({self.admitted, self.scheduler.changed()}, timeout=remaining)
+
+
+class GenerationScheduler:
+    """Bounded-concurrency priority queue with deadline-based load shedding"""
+
+    def __init__(self, concurrency: int = OLLAMA_CONCURRENCY, expected_seconds: float = OLLAMA_EXPECTED_SECONDS):
+        """
+        Args:
+            concurrency: Generations allowed to run at once
+            expected_seconds: Initial generation time estimate
+        """
+        self.concurrency = max(1, concurrency)
+        self.service_time = expected_seconds
+        self._queue: list[Ticket] = []
+        self._running: set[Ticket] = set()
+        self._seq = itertools.count()
+        self._changed: asyncio.Future | None = None
+        self.admitted = 0
+        self.completed = 0
+        self.shed_count = 0
+
+    def changed(self) -> asyncio.Future:
+        """Future resolved at the next queue change"""
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._changed.done() or self._changed.get_loop() is not loop:
+            self._changed = loop.create_future()
+        return self._changed
+
+    def _notify(self):
+        if self._changed is not None and not self._changed.done():
+            self._changed.set_result(None)
+
+    def _predicted_wait(self, ahead: int) -> float:
+        """Seconds until a slot is free for a request with `ahead` queued requests before it"""
+        now = time.monotonic()
+        # When each slot frees up: now for idle slots, else when its generation is expected to end
+        free_at = [0.0] * (self.concurrency - len(self._running))
+        free_at += [max(0.0, self.service_time - (now - t.started_at)) for t in self._running]
+        heapq.heapify(free_at)
+        for _ in range(ahead):
+            heapq.heapreplace(free_at, free_at[0] + self.service_time)
+        return free_at[0]
+
+    def position(self, ticket: Ticket) -> tuple[int, float]:
+        """(1-based queue position, estimated wait) of a queued ticket"""
+        ahead = sum(1 for other in self._queue if other < ticket)
+        return ahead + 1, self._predicted_wait(ahead)
+
+    def submit(self, priority: int = PRIORITY_INTERACTIVE, deadline: float | None = None) -> Ticket:
+        """
+        Queue a generation
+
+        Args:
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH (lower runs first)
+            deadline: Seconds the generation may wait for a slot (default: per priority)
+
+        Returns:
+            Ticket; wait on ticket.queue_updates() and call release() when done
+
+        Raises:
+            Overloaded: The predicted wait already exceeds the deadline
+        """
+        if deadline is None:
+            deadline = DEFAULT_DEADLINES.get(priority, OLLAMA_INTERACTIVE_DEADLINE)
+        ahead = sum(1 for other in self._queue if other.priority <= priority)
+        wait = self._predicted_wait(ahead)
+        if wait > deadline:
+            self.shed_count += 1
+            raise Overloaded(f"predicted wait {wait:.0f}s exceeds the {deadline:.0f}s deadline")
+
+        ticket = Ticket(self, priority, deadline, next(self._seq))
+        heapq.heappush(self._queue, ticket)
+        self._dispatch()
+        return ticket
+
+    def _dispatch(self):
+        while self._queue and len(self._running) < self.concurrency:
+            ticket = heapq.heappop(self._queue)
+            ticket.started_at = time.monotonic()
+            self._running.add(ticket)
+            self.admitted += 1
+            ticket.admitted.set_result(None)
+        self._notify()
+
+    def _remove_queued(self, ticket: Ticket) -> bool:
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            return True
+        return False
+
+    def shed(self, ticket: Ticket):
+        """Drop a queued ticket whose deadline passed"""
+        if self._remove_queued(ticket):
+            self.shed_count += 1
+            self._notify()
+
+    def release(self, ticket: Ticket, record: bool = False):
+        """
+        Free a ticket's slot (or queue place) and start the next generation
+
+        Args:
+            ticket: Ticket from submit()
+            record: The generation ran to completion; use its duration for predictions
+        """
+        if ticket in self._running:
+            self._running.discard(ticket)
+            if record:
+                duration = time.monotonic() - ticket.started_at
+                self.service_time += SERVICE_TIME_SMOOTHING * (duration - self.service_time)
+                self.completed += 1
+        else:
+            self._remove_queued(ticket)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, deadline: float | None = None):
+        """
+        Hold a generation slot for the duration of the block
+
+        Raises:
+            Overloaded: Shed at admission or while queued
+        """
+        ticket = self.submit(priority, deadline)
+        completed = False
+        try:
+            async for _ in ticket.queue_updates():
+                pass
+            yield ticket
+            completed = True
+        finally:
+            self.release(ticket, record=completed)
+
+    def stats(self) -> dict[str, Any]:
+        """Queue and shedding counters since startup"""
+        decided = self.admitted + self.shed_count
+        return {
+            "concurrency": self.concurrency,
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "estimated_generation_s": round(self.service_time, 1),
+            "estimated_wait_s": round(self._predicted_wait(len(self._queue)), 1),
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "shed": self.shed_count,
+            "shed_ratio": round(self.shed_count / decided, 3) if decided else 0.0,
+        }
+
+
+# Shared by every Ollama caller in the process (AI routes and quiz generation)
+generation_scheduler = GenerationScheduler()
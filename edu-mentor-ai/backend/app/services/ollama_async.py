@@ -0,0 +1,208 @@
+"""
+Async Ollama client with a shared keep-alive connection pool
+
+Generations take tens of seconds on CPU. Called with requests from sync
+routes, each one holds a Starlette threadpool thread for its whole duration
+(up to OLLAMA_TIMEOUT) and opens a new TCP connection, so a few slow answers
+can starve /content and /quiz. Async routes await this client instead: a
+waiting generation costs no thread, and connections are reused.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+import httpx
+
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "180"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+OLLAMA_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_KEEPALIVE_CONNECTIONS", "8"))
+
+T = TypeVar("T")
+
+
+class AsyncOllamaClient:
+    """Async wrapper around the Ollama HTTP API (one pooled httpx.AsyncClient)"""
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_URL,
+        timeout: float = OLLAMA_TIMEOUT,
+        max_connections: int = OLLAMA_MAX_CONNECTIONS
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=self._timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(OLLAMA_KEEPALIVE_CONNECTIONS, max_connections),
+            ),
+        )
+
+    @staticmethod
+    def _timeout(timeout: float | None) -> httpx.Timeout:
+        # For streams the read timeout applies between chunks, i.e. between tokens
+        return httpx.Timeout(timeout, connect=min(OLLAMA_CONNECT_TIMEOUT, timeout or OLLAMA_CONNECT_TIMEOUT))
+
+    async def _post(self, path: str, payload: dict[str, Any], timeout: float | None) -> dict[str, Any]:
+        resp = await self._client.post(path, json=payload, timeout=self._timeout(timeout or self.timeout))
+        resp.raise_for_status()
+        return resp.json()
+
+    async def generate(
+        self,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        options: dict[str, Any] | None = None,
+        timeout: float | None = None
+    ) -> dict[str, Any]:
+        """
+        Complete a prompt (/api/generate, non-streaming)
+
+        Args:
+            model: Ollama model name
+            prompt: Prompt text
+            system: System prompt
+            options: Sampling options (temperature, num_predict, ...)
+            timeout: Seconds for this call (default: client timeout)
+
+        Returns:
+            Ollama response dict ("response" holds the text)
+        """
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options or {}}
+        if system is not None:
+            payload["system"] = system
+        return await self._post("/api/generate", payload, timeout)
+
+    async def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        options: dict[str, Any] | None = None,
+        timeout: float | None = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Stream /api/generate chunks as Ollama produces them
+
+        Closing the iterator early closes the connection, which stops generation.
+        Arguments as for generate(); `timeout` applies between chunks.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options or {}}
+        if system is not None:
+            payload["system"] = system
+        async with self._client.stream(
+            "POST", "/api/generate", json=payload, timeout=self._timeout(timeout or self.timeout)
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if line:
+                    yield json.loads(line)
+
+    async def chat(
+        self,
+        model: str,
+        messages: list[dict[str, str]],
+        options: dict[str, Any] | None = None,
+        timeout: float | None = None
+    ) -> dict[str, Any]:
+        """
+        Chat completion (/api/chat, non-streaming)
+
+        Args:
+            model: Ollama model name
+            messages: [{"role": "system" | "user" | "assistant", "content": ...}]
+            options: Sampling options
+            timeout: Seconds for this call (default: client timeout)
+
+        Returns:
+            Ollama response dict (["message"]["content"] holds the text)
+        """
+        payload = {"model": model, "messages": messages, "stream": False, "options": options or {}}
+        return await self._post("/api/chat", payload, timeout)
+
+    async def embeddings(self, model: str, prompt: str, timeout: float | None = None) -> list[float]:
+        """Embedding vector for a text (/api/embeddings)"""
+        data = await self._post("/api/embeddings", {"model": model, "prompt": prompt}, timeout)
+        return data.get("embedding", [])
+
+    async def tags(self, timeout: float | None = 5) -> list[dict[str, Any]]:
+        """Installed models (/api/tags)"""
+        resp = await self._client.get("/api/tags", timeout=self._timeout(timeout))
+        resp.raise_for_status()
+        return resp.json().get("models", [])
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: AsyncOllamaClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_ollama_client() -> AsyncOllamaClient:
+    """
+    Shared client for the running event loop
+
+    httpx connections belong to the loop that opened them, so a new client is
+    created if the loop changes (e.g. test clients that start their own loop).
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = AsyncOllamaClient()
+        _client_loop = loop
+    return _client
+
+
+def call_from_thread(make_call: Callable[[AsyncOllamaClient], Awaitable[T]]) -> T:
+    """
+    Run an async client call from synchronous code (sync routes, CLI tools)
+
+    In the server the call runs on the event loop the shared client is bound
+    to (bind_ollama_client at app startup), so sync callers share its connection pool
+    and only the calling thread blocks. Without a running server loop it runs
+    in a fresh loop with a short-lived client.
+
+    Args:
+        make_call: Builds the awaitable from a client, e.g. lambda c: c.generate(...)
+    """
+    loop = _client_loop
+    if loop is not None and loop.is_running():
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("call_from_thread() would block the event loop; await the client instead")
+
+        async def on_loop():
+            return await make_call(get_ollama_client())
+
+        return asyncio.run_coroutine_threadsafe(on_loop(), loop).result()
+
+    async def standalone():
+        client = AsyncOllamaClient()
+        try:
+            return await make_call(client)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(standalone())
+
+
+async def close_ollama_client():
+    """Close the shared client's connections (app shutdown)"""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = _client_loop = None
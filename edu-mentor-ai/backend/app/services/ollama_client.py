@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import os
-import requests
+
+from .llm_scheduler import PRIORITY_INTERACTIVE, Overloaded, generation_scheduler
+from .ollama_async import call_from_thread
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
 OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "180"))
@@ -31,25 +33,30 @@ def select_model_for_grade(grade: int | None) -> str:
     return MODEL_PACK_E
 
 
-def ollama_generate(system_prompt: str, user_prompt: str, grade: int | None = None) -> tuple[str, str]:
+def ollama_generate(
+    system_prompt: str, user_prompt: str, grade: int | None = None, priority: int = PRIORITY_INTERACTIVE
+) -> tuple[str, str]:
     model = select_model_for_grade(grade)
-    payload = {
-        "model": model,
-        "prompt": user_prompt,
-        "system": system_prompt,
-        "stream": False,
-        "options": {
-            "temperature": OLLAMA_TEMPERATURE,
-            "top_p": OLLAMA_TOP_P,
-            "top_k": OLLAMA_TOP_K,
-            "num_predict": OLLAMA_NUM_PREDICT,
-        },
+    options = {
+        "temperature": OLLAMA_TEMPERATURE,
+        "top_p": OLLAMA_TOP_P,
+        "top_k": OLLAMA_TOP_K,
+        "num_predict": OLLAMA_NUM_PREDICT,
     }
 
+    async def scheduled(client):
+        # Callers are request handlers with a student waiting; background work passes PRIORITY_BATCH
+        async with generation_scheduler.slot(priority):
+            return await client.generate(
+                model, user_prompt, system=system_prompt, options=options, timeout=OLLAMA_TIMEOUT
+            )
+
     try:
-        resp = requests.post(f"{OLLAMA_URL}/api/generate", json=payload, timeout=OLLAMA_TIMEOUT)
-        resp.raise_for_status()
-        data = resp.json()
+        # Runs on the server's event loop with the shared async connection pool
+        data = call_from_thread(scheduled)
         return data.get("response", ""), model
+    except Overloaded as e:
+        print(f"⏳ Generation shed: {e}")
+        return "", model
     except Exception:
         return "", model
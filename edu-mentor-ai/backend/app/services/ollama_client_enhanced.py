@@ -5,15 +5,21 @@ Supports grade-specific models, safety guardrails, and offline-first operation
 
 from __future__ import annotations
 
+import asyncio
 import os
 import re
-import requests
-from typing import Any
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator
 
+import httpx
+
+from .answer_cache import AnswerCache, answer_key, get_answer_cache
+from .llm_scheduler import PRIORITY_INTERACTIVE, Overloaded, generation_scheduler
+from .ollama_async import OLLAMA_URL, get_ollama_client
 from .rag_engine import get_rag_engine, RAGResult
+from .single_flight import SingleFlight
 
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
-OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "180"))
 OLLAMA_TEMPERATURE = float(os.getenv("OLLAMA_TEMPERATURE", "0.2"))
 OLLAMA_TOP_P = float(os.getenv("OLLAMA_TOP_P", "0.85"))
 OLLAMA_TOP_K = int(os.getenv("OLLAMA_TOP_K", "35"))
@@ -25,6 +31,12 @@ MODEL_GRADE_1_3 = os.getenv("MODEL_GRADE_1_3", "qwen:1.8b")  # Fast and efficien
 MODEL_GRADE_4_6 = os.getenv("MODEL_GRADE_4_6", "qwen:1.8b")  # Same for all
 MODEL_DEFAULT = os.getenv("OLLAMA_MODEL", "qwen:1.8b")
 
+# RAG context token budget per grade (prompt evaluation time grows with context length)
+RAG_CONTEXT_COMPRESSION = os.getenv("RAG_CONTEXT_COMPRESSION", "1") == "1"
+RAG_CONTEXT_TOKENS_LKG_UKG = int(os.getenv("RAG_CONTEXT_TOKENS_LKG_UKG", "120"))
+RAG_CONTEXT_TOKENS_GRADE_1_3 = int(os.getenv("RAG_CONTEXT_TOKENS_GRADE_1_3", "200"))
+RAG_CONTEXT_TOKENS_GRADE_4_6 = int(os.getenv("RAG_CONTEXT_TOKENS_GRADE_4_6", "300"))
+
 
 # Safety filters
 UNSAFE_PATTERNS = [
@@ -35,6 +47,14 @@ UNSAFE_PATTERNS = [
     r'\b(steal|theft|திருட)\b',
 ]
 
+# Streaming: text is forwarded a word at a time, each word checked together with
+# the tail of what was already sent (so a pattern split across tokens still matches)
+STREAM_SAFETY_WINDOW = int(os.getenv("OLLAMA_STREAM_SAFETY_WINDOW", "80"))  # Chars of sent text re-checked
+STREAM_MAX_HOLDBACK = int(os.getenv("OLLAMA_STREAM_MAX_HOLDBACK", "40"))  # Flush a word longer than this anyway
+
+# Identical concurrent generations (same answer-cache key) share one upstream call
+generation_flight = SingleFlight()
+
 # Grade restrictions
 MAX_GRADE = 7  # LKG-6th (0-7 in our system, where 0=LKG, 1=UKG, 2=1st, ..., 7=6th)
 
@@ -63,6 +83,27 @@ def select_model_for_grade(grade: int | None) -> str:
         return MODEL_DEFAULT
 
 
+def context_budget_for_grade(grade: int | None) -> int:
+    """
+    RAG context token budget for a student grade
+    
+    Args:
+        grade: Student grade (0=LKG, 1=UKG, 2=1st, ..., 7=6th)
+    
+    Returns:
+        Estimated prompt tokens allowed for syllabus references
+    """
+    if grade is None or grade > 7:
+        return RAG_CONTEXT_TOKENS_GRADE_4_6
+    
+    if grade <= 1:  # LKG, UKG
+        return RAG_CONTEXT_TOKENS_LKG_UKG
+    elif 2 <= grade <= 4:  # 1st-3rd
+        return RAG_CONTEXT_TOKENS_GRADE_1_3
+    else:  # 4th-6th
+        return RAG_CONTEXT_TOKENS_GRADE_4_6
+
+
 def check_safety(text: str) -> tuple[bool, str]:
     """
     Check if text contains unsafe content
@@ -95,23 +136,30 @@ def build_rag_context(
     grade: int,
     subject: str | None,
     lang: str | None,
-    top_k: int = 3
+    top_k: int = 3,
+    token_budget: int | None = None
 ) -> str:
     """
     Retrieve relevant content from RAG system
     
+    Only the sentences that best match the query are kept, within a token
+    budget, so the prompt stays short (see RAGEngine.compress_results).
+    
     Args:
         query: User's question
         grade: Student grade
         subject: Subject filter
         lang: Language preference
         top_k: Number of results
+        token_budget: Context token budget (default: per grade, see context_budget_for_grade)
     
     Returns:
         Formatted context string
     """
     try:
         rag = get_rag_engine(use_vectors=True)
+        # Repeated questions are served from RAGEngine's result cache (no FAISS/FTS work)
+        # until the next index write bumps the index generation
         results = rag.retrieve(
             query=query,
             grade=grade,
@@ -121,61 +169,87 @@ def build_rag_context(
             method="hybrid"
         )
         
-        if not results:
-            return ""
+        if results and RAG_CONTEXT_COMPRESSION:
+            if token_budget is None:
+                token_budget = context_budget_for_grade(grade)
+            results = rag.compress_results(query, results, token_budget)
         
-        context_parts = []
-        for i, result in enumerate(results, 1):
-            context_parts.append(
-                f"[பாடம் {i}]\n"
-                f"தரம்: {result.grade}\n"
-                f"பாடம்: {result.subject}\n"
-                f"உள்ளடக்கம்:\n{result.content}\n"
-            )
+        return _format_rag_context(results)
+    
+    except Exception as e:
+        print(f"RAG retrieval error: {e}")
+        return ""
+
+
+async def build_rag_context_async(
+    query: str,
+    grade: int,
+    subject: str | None,
+    lang: str | None,
+    top_k: int = 3,
+    token_budget: int | None = None
+) -> str:
+    """
+    build_rag_context for async callers: retrieval uses RAGEngine.retrieve_async
+    and compression (sentence embedding) runs in a worker thread
+    """
+    try:
+        rag = get_rag_engine(use_vectors=True)
+        results = await rag.retrieve_async(
+            query=query,
+            grade=grade,
+            subject=subject,
+            lang=lang,
+            top_k=top_k,
+            method="hybrid"
+        )
         
-        return "\n---\n".join(context_parts)
+        if results and RAG_CONTEXT_COMPRESSION:
+            if token_budget is None:
+                token_budget = context_budget_for_grade(grade)
+            results = await asyncio.to_thread(rag.compress_results, query, results, token_budget)
+        
+        return _format_rag_context(results)
     
     except Exception as e:
         print(f"RAG retrieval error: {e}")
         return ""
 
 
-def ollama_generate(
+def _format_rag_context(results: list[RAGResult]) -> str:
+    context_parts = []
+    for i, result in enumerate(results, 1):
+        context_parts.append(
+            f"[பாடம் {i}]\n"
+            f"தரம்: {result.grade}\n"
+            f"பாடம்: {result.subject}\n"
+            f"உள்ளடக்கம்:\n{result.content}\n"
+        )
+    
+    return "\n---\n".join(context_parts)
+
+
+async def _prepare_request(
     system_prompt: str,
     user_prompt: str,
-    grade: int | None = None,
-    subject: str | None = None,
-    lang: str | None = None,
-    use_rag: bool = True
-) -> tuple[str, str]:
+    grade: int | None,
+    subject: str | None,
+    lang: str | None,
+    use_rag: bool
+) -> tuple[str, dict[str, Any]]:
     """
-    Generate AI response using Ollama with RAG enhancement
-    
-    Args:
-        system_prompt: System instruction
-        user_prompt: User's query
-        grade: Student grade
-        subject: Subject context
-        lang: Language preference
-        use_rag: Enable RAG context retrieval
+    Model and generate() arguments for a prompt that passed the safety check
     
     Returns:
-        (response_text, model_name)
+        (model_name, AsyncOllamaClient.generate keyword arguments)
     """
-    # Enforce safety and grade limits
-    grade = enforce_grade_limit(grade)
-    
-    is_safe, safety_reason = check_safety(user_prompt)
-    if not is_safe:
-        return safety_reason, "safety_filter"
-    
     # Select appropriate model
     model = select_model_for_grade(grade)
     
     # Build RAG context if enabled
     rag_context = ""
     if use_rag:
-        rag_context = build_rag_context(user_prompt, grade, subject, lang, top_k=3)
+        rag_context = await build_rag_context_async(user_prompt, grade, subject, lang, top_k=3)
     
     # Enhance user prompt with RAG context
     enhanced_prompt = user_prompt
@@ -194,7 +268,6 @@ def ollama_generate(
         "model": model,
         "prompt": enhanced_prompt,
         "system": system_prompt,
-        "stream": False,
         "options": {
             "temperature": OLLAMA_TEMPERATURE,
             "top_p": OLLAMA_TOP_P,
@@ -203,33 +276,236 @@ def ollama_generate(
             "repeat_penalty": 1.1,
         },
     }
+    return model, payload
+
+
+async def ollama_generate(
+    system_prompt: str,
+    user_prompt: str,
+    grade: int | None = None,
+    subject: str | None = None,
+    lang: str | None = None,
+    use_rag: bool = True,
+    priority: int = PRIORITY_INTERACTIVE
+) -> tuple[str, str]:
+    """
+    Generate AI response using Ollama with RAG enhancement
+    
+    Answers are served from the answer cache when the same model, prompts
+    (including RAG context) and options were answered before, and identical
+    concurrent calls share one generation (see generation_flight). The
+    generation waits for an Ollama slot in generation_scheduler; when it
+    cannot start within its priority's deadline the fallback answer is returned.
     
+    Args:
+        system_prompt: System instruction
+        user_prompt: User's query
+        grade: Student grade
+        subject: Subject context
+        lang: Language preference
+        use_rag: Enable RAG context retrieval
+        priority: Scheduler priority (PRIORITY_INTERACTIVE or PRIORITY_BATCH)
+    
+    Returns:
+        (response_text, model_name)
+    """
+    # Enforce safety and grade limits
+    grade = enforce_grade_limit(grade)
+    lang = lang or "ta"
+    
+    is_safe, safety_reason = check_safety(user_prompt)
+    if not is_safe:
+        return safety_reason, "safety_filter"
+    
+    model, payload = await _prepare_request(system_prompt, user_prompt, grade, subject, lang, use_rag)
+    
+    cache = get_answer_cache()
+    key = answer_key(**payload)
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, key)  # SQLite stays off the event loop
+        if cached is not None:
+            return cached, model
+    
+    # Fallback messages depend on lang, so it is part of the flight key
+    response_text = await generation_flight.run(
+        (key, lang, priority), lambda: _generate(payload, lang, cache, key, priority)
+    )
+    return response_text, model
+
+
+async def _generate(
+    payload: dict[str, Any],
+    lang: str,
+    cache: AnswerCache | None,
+    key: str,
+    priority: int
+) -> str:
+    """One upstream generation for ollama_generate: the answer, or a fallback message"""
     try:
-        resp = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json=payload,
-            timeout=OLLAMA_TIMEOUT
-        )
-        resp.raise_for_status()
-        data = resp.json()
+        async with generation_scheduler.slot(priority):
+            data = await get_ollama_client().generate(**payload)
         response_text = data.get("response", "")
         
         # Post-process response for safety
         if not response_text.strip():
-            return _fallback_response(lang or "ta"), model
+            return _fallback_response(lang)
         
         # Check response safety
         is_safe, _ = check_safety(response_text)
         if not is_safe:
-            return _fallback_response(lang or "ta"), model
+            return _fallback_response(lang)
         
-        return response_text.strip(), model
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, payload["model"], response_text.strip())
+        return response_text.strip()
     
-    except requests.exceptions.Timeout:
-        return _timeout_response(lang or "ta"), model
+    except Overloaded as e:
+        print(f"⏳ Generation shed: {e}")
+        return _fallback_response(lang)
+    except httpx.TimeoutException:
+        return _timeout_response(lang)
     except Exception as e:
         print(f"Ollama error: {e}")
-        return _error_response(lang or "ta"), model
+        return _error_response(lang)
+
+
+async def ollama_generate_stream(
+    system_prompt: str,
+    user_prompt: str,
+    grade: int | None = None,
+    subject: str | None = None,
+    lang: str | None = None,
+    use_rag: bool = True,
+    priority: int = PRIORITY_INTERACTIVE
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """
+    Streaming variant of ollama_generate: yields events as Ollama produces tokens
+    
+    Events are (name, data) pairs:
+        ("start", {"model"})                  before the first token
+        ("queued", {"position", "estimated_wait_s"})  waiting for an Ollama slot
+        ("token", {"text"})                   next piece of the reply
+        ("replace", {"text"})                 discard the streamed text and show this instead
+                                              (unsafe continuation, timeout, error, empty reply)
+        ("done", {"reply", "model", "first_token_ms", "cached"})
+    
+    Text is released up to the last word boundary and only after the safety
+    filter passes on it plus the last STREAM_SAFETY_WINDOW sent characters;
+    on an unsafe match the Ollama stream is closed, which stops generation.
+    A cached answer is sent as a single token event. Identical concurrent
+    streams share one generation: a later caller first receives the tokens
+    already produced. The generation stops once every caller has gone.
+    A stream that cannot get an Ollama slot within its deadline ends with
+    a replace event carrying the fallback answer.
+    
+    Args:
+        Same as ollama_generate
+    """
+    grade = enforce_grade_limit(grade)
+    lang = lang or "ta"
+    
+    is_safe, safety_reason = check_safety(user_prompt)
+    if not is_safe:
+        yield "replace", {"text": safety_reason}
+        yield "done", {"reply": safety_reason, "model": "safety_filter", "first_token_ms": None, "cached": False}
+        return
+    
+    model, payload = await _prepare_request(system_prompt, user_prompt, grade, subject, lang, use_rag)
+    yield "start", {"model": model}
+    
+    started = time.perf_counter()
+    cache = get_answer_cache()
+    key = answer_key(**payload)
+    cached = await asyncio.to_thread(cache.get, key) if cache is not None else None
+    if cached is not None:
+        yield "token", {"text": cached}
+        first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+        yield "done", {"reply": cached, "model": model, "first_token_ms": first_token_ms, "cached": True}
+        return
+    
+    first_token_ms = None
+    shared = generation_flight.stream(
+        (key, lang, priority), lambda: _stream_generation(payload, lang, cache, key, priority)
+    )
+    async with aclosing(shared) as events:
+        async for event, data in events:
+            if event == "token" and first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+            if event == "done":
+                data = {**data, "model": model, "first_token_ms": first_token_ms, "cached": False}
+            yield event, data
+
+
+async def _stream_generation(
+    payload: dict[str, Any],
+    lang: str,
+    cache: AnswerCache | None,
+    key: str,
+    priority: int
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """One upstream stream for ollama_generate_stream: queued and token events, optional replace, done"""
+    sent: list[str] = []
+    tail = ""  # Last STREAM_SAFETY_WINDOW chars already sent
+    pending = ""  # Received but not yet checked
+    replacement = None
+    ticket = None
+    
+    def release(text: str) -> bool:
+        nonlocal tail
+        window = tail + text
+        if not check_safety(window)[0]:
+            return False
+        sent.append(text)
+        tail = window[-STREAM_SAFETY_WINDOW:]
+        return True
+    
+    try:
+        ticket = generation_scheduler.submit(priority)
+        async for position, wait in ticket.queue_updates():
+            yield "queued", {"position": position, "estimated_wait_s": round(wait, 1)}
+        
+        # Leaving the loop early closes the Ollama stream (stops generation)
+        async with aclosing(get_ollama_client().generate_stream(**payload)) as chunks:
+            async for chunk in chunks:
+                pending += chunk.get("response", "")
+                
+                # Hold back a trailing partial word (a pattern could complete in the next token)
+                cut = max(pending.rfind(" "), pending.rfind("\n")) + 1
+                if chunk.get("done"):
+                    cut = len(pending)
+                elif not cut and len(pending) > STREAM_MAX_HOLDBACK:
+                    cut = len(pending)
+                if cut:
+                    text, pending = pending[:cut], pending[cut:]
+                    if not release(text):
+                        print("⚠️ Unsafe continuation, stream cut off")
+                        replacement = _fallback_response(lang)
+                        break
+                    yield "token", {"text": text}
+                if chunk.get("done"):
+                    break
+        generation_scheduler.release(ticket, record=True)
+    except Overloaded as e:
+        print(f"⏳ Generation shed: {e}")
+        replacement = _fallback_response(lang)
+    except httpx.TimeoutException:
+        replacement = _timeout_response(lang)
+    except Exception as e:
+        print(f"Ollama error: {e}")
+        replacement = _error_response(lang)
+    finally:
+        if ticket is not None:
+            generation_scheduler.release(ticket)  # No-op after the release above
+    
+    reply = "".join(sent).strip()
+    if replacement is None and not reply:
+        replacement = _fallback_response(lang)
+    if replacement is not None:
+        reply = replacement
+        yield "replace", {"text": replacement}
+    elif cache is not None:
+        await asyncio.to_thread(cache.put, key, payload["model"], reply)
+    yield "done", {"reply": reply}
 
 
 def _fallback_response(lang: str) -> str:
@@ -259,7 +535,7 @@ def _error_response(lang: str) -> str:
     return "AI is not available right now. Please try again later."
 
 
-def check_ollama_health() -> dict[str, Any]:
+async def check_ollama_health() -> dict[str, Any]:
     """
     Check if Ollama is running and accessible
     
@@ -267,9 +543,7 @@ def check_ollama_health() -> dict[str, Any]:
         Health status dict
     """
     try:
-        resp = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
-        resp.raise_for_status()
-        models = resp.json().get("models", [])
+        models = await get_ollama_client().tags(timeout=5)
         
         return {
             "status": "healthy",
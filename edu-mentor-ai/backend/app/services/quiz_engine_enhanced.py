@@ -181,6 +181,7 @@ class QuizEngine:
             "தாவரங்கள்" if language == "ta" else "plants",
             "நீர்" if language == "ta" else "water"
         ]
+        topic_results = rag.retrieve_many(topics, grade, subject, language, top_k=1)
         
         questions = []
         
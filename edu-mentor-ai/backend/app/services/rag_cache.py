@@ -0,0 +1,320 @@
+"""
+Caches for the RAG engine
+
+- QueryEmbeddingCache: normalized query -> embedding, bounded LRU with
+  optional SQLite persistence so classroom questions survive restarts
+- RetrievalCache: full retrieve() results, keyed by the arguments plus the
+  index generation so any index write makes old entries unreachable
+- EmbeddingStore: lesson text embeddings in SQLite, keyed by a hash of
+  (model, text), so rebuilds only encode new or changed text
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+_PUNCTUATION = re.compile(r"[\s?!.,;:।、。؟¿¡\"'“”‘’()\[\]{}]+")
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a question: NFC, case-folded, punctuation and spacing collapsed"""
+    text = unicodedata.normalize("NFC", query).casefold()
+    return _PUNCTUATION.sub(" ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query embeddings, optionally persisted to SQLite"""
+
+    def __init__(
+        self,
+        model_name: str,
+        max_size: int = 2048,
+        connect: Callable[[], sqlite3.Connection] | None = None,
+        max_persisted: int = 50_000,
+    ):
+        """
+        Args:
+            model_name: Embedding model; part of the key so a model change never reuses vectors
+            max_size: Entries kept in memory
+            connect: Returns a SQLite connection for persistence (None = memory only)
+            max_persisted: Rows kept in SQLite before the least recently used are trimmed
+        """
+        self.model_name = model_name
+        self.max_size = max_size
+        self.max_persisted = max_persisted
+        self._connect = connect
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self._connect is not None:
+            self._init_table()
+            self._warm()
+
+    def _init_table(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_embedding_cache (
+                model TEXT NOT NULL,
+                query TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (model, query)
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_query_cache_last_used ON query_embedding_cache(last_used)"
+        )
+        conn.commit()
+
+    def _warm(self):
+        """Pre-load the most recently used persisted queries"""
+        rows = self._connect().execute(
+            "SELECT query, vector FROM query_embedding_cache WHERE model = ? "
+            "ORDER BY last_used DESC LIMIT ?",
+            (self.model_name, self.max_size)
+        ).fetchall()
+        with self._lock:
+            for query, blob in reversed(rows):
+                self._entries[query] = np.frombuffer(blob, dtype=np.float32).copy()
+
+    def get(self, query: str):
+        """Cached embedding for a query, or None"""
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        if self._connect is not None:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT vector FROM query_embedding_cache WHERE model = ? AND query = ?",
+                (self.model_name, key)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE query_embedding_cache SET last_used = CURRENT_TIMESTAMP WHERE model = ? AND query = ?",
+                    (self.model_name, key)
+                )
+                conn.commit()
+                vector = np.frombuffer(row[0], dtype=np.float32).copy()
+                self._remember(key, vector)
+                with self._lock:
+                    self.disk_hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, query: str, vector):
+        """Store a freshly computed embedding"""
+        key = normalize_query(query)
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        self._remember(key, vector)
+
+        if self._connect is not None:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embedding_cache (model, query, vector) VALUES (?, ?, ?)",
+                (self.model_name, key, vector.tobytes())
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                conn.execute("""
+                    DELETE FROM query_embedding_cache WHERE rowid IN (
+                        SELECT rowid FROM query_embedding_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_persisted,))
+            conn.commit()
+
+    def _remember(self, key: str, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+class RetrievalCache:
+    """Bounded LRU of retrieve() results, versioned by index generation"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, list] = OrderedDict()
+        self._generation: int | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query: str, grade: int, subject: str | None, lang: str | None, top_k: int, method: str) -> tuple:
+        return (normalize_query(query), grade, subject, lang, top_k, method)
+
+    def get(self, key: tuple, generation: int) -> list | None:
+        """Cached results for key at this index generation, or None"""
+        with self._lock:
+            if generation != self._generation:
+                # Index changed since these results were computed
+                self._entries.clear()
+                self._generation = generation
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(results)
+
+    def put(self, key: tuple, generation: int, results: list):
+        with self._lock:
+            if generation != self._generation:
+                return  # Computed against an index that has since changed
+            self._entries[key] = list(results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+class EmbeddingStore:
+    """Persistent document embeddings keyed by sha256(model, text), stored as float16"""
+
+    MAX_VARIABLES = 500  # Stay well below SQLite's bound-parameter limit
+
+    def __init__(self, model_name: str, connect: Callable[[], sqlite3.Connection]):
+        """
+        Args:
+            model_name: Embedding model; part of the key so a model change never reuses vectors
+            connect: Returns a SQLite connection
+        """
+        self.model_name = model_name
+        self._connect = connect
+        self.hits = 0
+        self.misses = 0
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_store (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, texts: list[str], encode: Callable[[list[str]], Any]) -> tuple[Any, int]:
+        """
+        Embeddings for texts, calling `encode` only for texts not stored yet
+
+        Args:
+            texts: Texts to embed
+            encode: Computes normalized embeddings for a list of texts
+
+        Returns:
+            (float32 array of shape (len(texts), dim), number of texts encoded)
+        """
+        keys = [self.key(text) for text in texts]
+        stored = self._get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in stored]
+
+        if missing:
+            encoded = np.asarray(encode([texts[i] for i in missing]), dtype=np.float32)
+            self._put_many([keys[i] for i in missing], encoded)
+            for i, vector in zip(missing, encoded):
+                stored[keys[i]] = vector
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return np.vstack([stored[key] for key in keys]).astype(np.float32), len(missing)
+
+    def _get_many(self, keys: list[str]) -> dict[str, Any]:
+        vectors = {}
+        conn = self._connect()
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), self.MAX_VARIABLES):
+            batch = unique[start:start + self.MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            for key, blob in conn.execute(
+                f"SELECT key, vector FROM embedding_store WHERE key IN ({placeholders})", batch
+            ):
+                vectors[key] = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+        return vectors
+
+    def _put_many(self, keys: list[str], vectors):
+        # Committed per batch so an interrupted indexing run keeps its progress
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_store (key, vector) VALUES (?, ?)",
+                [(key, vector.astype(np.float16).tobytes()) for key, vector in zip(keys, vectors)]
+            )
+
+    def prune(self, texts: list[str]) -> int:
+        """Delete stored embeddings for anything but `texts`; returns rows removed"""
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS embedding_store_keep (key TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM embedding_store_keep")
+            conn.executemany(
+                "INSERT OR IGNORE INTO embedding_store_keep (key) VALUES (?)",
+                [(self.key(text),) for text in texts]
+            )
+            cursor = conn.execute(
+                "DELETE FROM embedding_store WHERE key NOT IN (SELECT key FROM embedding_store_keep)"
+            )
+            conn.execute("DELETE FROM embedding_store_keep")
+            return cursor.rowcount
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters since startup"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,169 @@
+"""
+Context compression for RAG prompts
+
+Prompt evaluation on small CPU models grows linearly with prompt length, so
+instead of pasting whole lesson chunks into the prompt we keep only the
+sentences that best match the question, up to a token budget:
+
+- split each retrieved chunk into sentences
+- score sentences (embedding similarity or FTS5 highlight() matches, see
+  RAGEngine.compress_results)
+- pack the best sentences across all hits until the budget is used,
+  keeping each hit's sentences in their original order
+
+split_sections() cuts lessons into passages for per-section embeddings.
+"""
+
+from __future__ import annotations
+
+import re
+
+
+# Sentence ends: Latin punctuation, Devanagari danda, or line breaks
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+|\n+")
+
+# Rough characters per token for qwen-style BPE vocabularies: ASCII text packs
+# ~4 characters into a token, Tamil and other Indic scripts only ~1.5
+ASCII_CHARS_PER_TOKEN = 4.0
+OTHER_CHARS_PER_TOKEN = 1.5
+
+MIN_SENTENCE_CHARS = 3
+
+# Sections: short paragraphs (headings, one-liners) are merged into the next one
+SECTION_CHARS = 500
+MIN_SECTION_CHARS = 150
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split lesson text into sentences (fragments shorter than MIN_SENTENCE_CHARS dropped)"""
+    return [
+        sentence.strip()
+        for sentence in _SENTENCE_END.split(text or "")
+        if len(sentence.strip()) >= MIN_SENTENCE_CHARS
+    ]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count without loading a tokenizer"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    other_chars = len(text) - ascii_chars
+    return int(ascii_chars / ASCII_CHARS_PER_TOKEN + other_chars / OTHER_CHARS_PER_TOKEN) + 1
+
+
+def _truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut text to roughly `tokens` tokens, on a word boundary when possible"""
+    if estimate_tokens(text) <= tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= tokens:
+            low = mid
+        else:
+            high = mid - 1
+    cut = text[:low]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + " …"
+
+
+def pack_sentences(
+    scored_hits: list[list[tuple[str, float]]], token_budget: int, min_score: float = 0.0
+) -> list[str]:
+    """
+    Choose sentences from several hits within a shared token budget
+
+    Every hit first gets its single best sentence (so no retrieved lesson is
+    dropped entirely), then the remaining budget goes to the highest scoring
+    sentences overall (those scoring min_score or less are never added, so
+    unrelated text does not fill up the prompt).
+
+    Args:
+        scored_hits: Per hit, its sentences in document order with a relevance score
+        token_budget: Maximum estimated tokens across all returned text
+        min_score: Relevance a sentence must exceed to be added after the first round
+
+    Returns:
+        One compressed text per hit (sentences in original order, may be "")
+    """
+    candidates = sorted(
+        (
+            (score, hit_index, sentence_index)
+            for hit_index, sentences in enumerate(scored_hits)
+            for sentence_index, (_, score) in enumerate(sentences)
+        ),
+        key=lambda c: (-c[0], c[1], c[2]),
+    )
+    texts: list[dict[int, str]] = [{} for _ in scored_hits]
+    remaining = token_budget
+
+    # Round 1: best sentence of each hit, trimmed to a fair share of the budget
+    share = max(1, token_budget // max(1, len(scored_hits)))
+    for score, hit_index, sentence_index in candidates:
+        if texts[hit_index] or remaining <= 0:
+            continue
+        sentence = _truncate_to_tokens(scored_hits[hit_index][sentence_index][0], min(share, remaining))
+        texts[hit_index][sentence_index] = sentence
+        remaining -= estimate_tokens(sentence)
+
+    # Round 2: best remaining sentences overall, skipping repeats and any that do not fit
+    for score, hit_index, sentence_index in candidates:
+        sentence = scored_hits[hit_index][sentence_index][0]
+        if score <= min_score:
+            break  # Candidates are sorted, nothing relevant is left
+        if sentence_index in texts[hit_index] or sentence in texts[hit_index].values():
+            continue
+        cost = estimate_tokens(sentence)
+        if cost <= remaining:
+            texts[hit_index][sentence_index] = sentence
+            remaining -= cost
+
+    return [" ".join(parts[i] for i in sorted(parts)) for parts in texts]
+
+
+def _sentence_spans(text: str, max_chars: int) -> list[tuple[int, int, bool]]:
+    """(start, end, ends_paragraph) per sentence, sentences over max_chars cut on whitespace"""
+    spans = []
+    start = 0
+    for match in [*_SENTENCE_END.finditer(text), None]:
+        end = match.start() if match else len(text)
+        ends_paragraph = match is None or match.group().count("\n") >= 2
+        while end - start > max_chars:
+            cut = text.rfind(" ", start + 1, start + max_chars)
+            cut = cut if cut > start else start + max_chars
+            spans.append((start, cut, False))
+            start = cut + 1 if text[cut:cut + 1] == " " else cut
+        if text[start:end].strip():
+            spans.append((start, end, ends_paragraph))
+        elif spans and ends_paragraph:
+            spans[-1] = (*spans[-1][:2], True)
+        start = match.end() if match else len(text)
+    return spans
+
+
+def split_sections(text: str, max_chars: int = SECTION_CHARS) -> list[tuple[int, int]]:
+    """
+    Split lesson text into passages of at most max_chars for separate embeddings
+
+    Sentences are grouped up to max_chars; a paragraph break ends a section
+    once it holds MIN_SECTION_CHARS, so headings stay with their paragraph.
+
+    Returns:
+        (start, end) character offsets into text, in document order
+    """
+    sections: list[tuple[int, int]] = []
+    current: tuple[int, int] | None = None
+    for start, end, ends_paragraph in _sentence_spans(text or "", max_chars):
+        if current and end - current[0] > max_chars:
+            sections.append(current)
+            current = None
+        current = (current[0] if current else start, end)
+        if ends_paragraph and current[1] - current[0] >= MIN_SECTION_CHARS:
+            sections.append(current)
+            current = None
+    if current:
+        # A short tail joins the previous section when it fits
+        if sections and current[1] - current[0] < MIN_SECTION_CHARS and current[1] - sections[-1][0] <= max_chars:
+            current = (sections.pop()[0], current[1])
+        sections.append(current)
+    return sections
@@ -0,0 +1,82 @@
+"""
+Near-duplicate detection for lesson chunks
+
+The same textbook is often ingested more than once (different file names,
+re-extracted PDFs), which fills FAISS and FTS with near-identical chunks that
+crowd out diverse hits. Each chunk gets a 64-bit SimHash of its word
+3-shingles; two chunks whose fingerprints differ in at most `max_distance`
+bits are treated as duplicates.
+
+Lookups use banding: the fingerprint is split into max_distance + 1 bands, and
+by the pigeonhole principle any fingerprint within max_distance bits shares at
+least one band exactly, so only chunks sharing a band are compared.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Hashable
+
+from .rag_cache import normalize_query
+
+
+SIMHASH_BITS = 64
+SHINGLE_WORDS = 3
+MIN_SHINGLES = 12  # Shorter texts have too few features for a reliable fingerprint
+
+
+def _shingles(text: str) -> list[str]:
+    words = normalize_query(text).split()
+    return [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+
+
+def simhash(text: str) -> int | None:
+    """
+    64-bit SimHash of a text's word shingles, as a signed int (fits SQLite INTEGER)
+
+    Returns None for texts too short to fingerprint reliably.
+    """
+    shingles = _shingles(text)
+    if len(shingles) < MIN_SHINGLES:
+        return None
+
+    weights = [0] * SIMHASH_BITS
+    for shingle in set(shingles):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    fingerprint = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    return fingerprint - (1 << SIMHASH_BITS) if fingerprint >= 1 << (SIMHASH_BITS - 1) else fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin((a ^ b) & ((1 << SIMHASH_BITS) - 1)).count("1")
+
+
+class NearDuplicateIndex:
+    """In-memory SimHash index, scoped so only chunks with the same scope key are compared"""
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self._band_bits = SIMHASH_BITS // self.bands
+        self._buckets: dict[tuple, list[tuple[int, str]]] = {}
+
+    def _band_keys(self, scope: Hashable, fingerprint: int):
+        unsigned = fingerprint & ((1 << SIMHASH_BITS) - 1)
+        mask = (1 << self._band_bits) - 1
+        for band in range(self.bands):
+            yield (scope, band, unsigned >> (band * self._band_bits) & mask)
+
+    def add(self, scope: Hashable, fingerprint: int, lesson_id: str):
+        for key in self._band_keys(scope, fingerprint):
+            self._buckets.setdefault(key, []).append((fingerprint, lesson_id))
+
+    def find(self, scope: Hashable, fingerprint: int, exclude: str | None = None) -> str | None:
+        """lesson_id of an indexed near-duplicate (other than `exclude`), or None"""
+        for key in self._band_keys(scope, fingerprint):
+            for other, lesson_id in self._buckets.get(key, ()):
+                if lesson_id != exclude and hamming_distance(fingerprint, other) <= self.max_distance:
+                    return lesson_id
+        return None
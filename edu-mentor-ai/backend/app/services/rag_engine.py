@@ -12,31 +12,368 @@ Features:
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import importlib.util
 import json
+import os
 import sqlite3
-from dataclasses import dataclass
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
 from typing import Any
 
-# Optional: FAISS for vector search (install: pip install faiss-cpu sentence-transformers)
-try:
-    import faiss
-    import numpy as np
-    from sentence_transformers import SentenceTransformer
-    FAISS_AVAILABLE = True
-except ImportError:
-    FAISS_AVAILABLE = False
-    faiss = None
-    np = None
-    SentenceTransformer = None
+from .embedders import create_embedder
+from .rag_cache import EmbeddingStore, QueryEmbeddingCache, RetrievalCache, normalize_query
+from .rag_context import pack_sentences, split_sections, split_sentences
+from .rag_dedupe import NearDuplicateIndex, simhash
+from .vector_store import FAISS_AVAILABLE as _FAISS_IMPORTED, PartitionedVectorStore
+from ..utils.lang import detect_script
 
 
 CONTENT_DIR = Path(__file__).resolve().parents[2] / "content"
 LESSON_DIR = Path(__file__).resolve().parents[2] / "data" / "lessons"
-DB_PATH = Path(__file__).resolve().parents[2] / "data" / "knowledge.db"
-VECTOR_PATH = Path(__file__).resolve().parents[2] / "data" / "vectors.faiss"
+# Where knowledge.db and the vector partitions live (benchmarks point this at a scratch dir)
+DATA_DIR = Path(os.getenv("RAG_DATA_DIR", str(Path(__file__).resolve().parents[2] / "data")))
+DB_PATH = DATA_DIR / "knowledge.db"
+VECTOR_PATH = DATA_DIR / "vectors.faiss"  # Legacy single index
+VECTOR_DIR = DATA_DIR / "vectors"  # One index per partition
+VECTOR_MAP_PATH = VECTOR_DIR / "docmap.npz"
+SECTION_VECTOR_DIR = DATA_DIR / "section_vectors"  # Per-section partitions (RAG_SECTION_VECTORS)
+LEGACY_MAP_PATH = VECTOR_PATH.with_suffix(".json")
 EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"  # 118MB, Tamil support
 
+# Embedding backend: sentence-transformers (PyTorch) or onnx-int8 (ONNX Runtime, see embedders.py)
+RAG_EMBEDDER = os.getenv("RAG_EMBEDDER", "sentence-transformers")
+ONNX_MODEL_DIR = Path(os.getenv(
+    "RAG_ONNX_MODEL_DIR",
+    str(Path(__file__).resolve().parents[2] / "data" / "models" / "minilm-l12-onnx-int8")
+))
+EMBEDDER_ID = f"{EMBEDDING_MODEL}@{RAG_EMBEDDER}"  # Cache key: backends give slightly different vectors
+
+# Optional: FAISS for vector search (install: pip install faiss-cpu sentence-transformers)
+# The embedding backend (torch / onnxruntime) is only imported when the model is loaded
+_EMBEDDER_MODULES = {
+    "sentence-transformers": ("sentence_transformers",),
+    "onnx-int8": ("onnxruntime", "tokenizers"),
+    "hash": (),
+}
+FAISS_AVAILABLE = _FAISS_IMPORTED and all(
+    importlib.util.find_spec(module) is not None
+    for module in _EMBEDDER_MODULES.get(RAG_EMBEDDER, ("sentence_transformers",))
+)
+
+# Vector index config: flat, fp16, sq8, pq, ivf, hnsw or binary (see vector_store.py)
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+RAG_INDEX_MMAP = os.getenv("RAG_INDEX_MMAP", "1") == "1"  # Let the OS page partitions in
+RAG_BINARY_RERANK_FACTOR = int(os.getenv("RAG_BINARY_RERANK_FACTOR", "16"))  # binary: candidates re-scored per result
+# Project embeddings to fewer dimensions (e.g. 128 or 192) once enough are indexed; 0 keeps all
+RAG_INDEX_PCA_DIM = int(os.getenv("RAG_INDEX_PCA_DIM", "0"))
+
+# Query embedding cache (children ask near-identical questions)
+RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "2048"))
+RAG_QUERY_CACHE_PERSIST = os.getenv("RAG_QUERY_CACHE_PERSIST", "1") == "1"
+
+# Document embeddings persisted by hash(model, text): rebuilds only encode new or changed text
+RAG_EMBEDDING_STORE = os.getenv("RAG_EMBEDDING_STORE", "1") == "1"
+
+# Near-duplicate chunks (same book ingested twice, re-extracted PDFs) are dropped at index time
+RAG_DEDUPE = os.getenv("RAG_DEDUPE", "1") == "1"
+RAG_DEDUPE_MAX_DISTANCE = int(os.getenv("RAG_DEDUPE_MAX_DISTANCE", "3"))  # SimHash bits out of 64
+
+# Hybrid retrieval: legs run concurrently on a bounded thread pool and are
+# merged with reciprocal rank fusion (score = sum of 1 / (RAG_RRF_K + rank))
+RAG_RETRIEVAL_WORKERS = int(os.getenv("RAG_RETRIEVAL_WORKERS", "4"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+# Route queries to the language of their script (Tamil / Latin) instead of the
+# UI language; mixed-script queries keep the caller's lang
+RAG_SCRIPT_ROUTING = os.getenv("RAG_SCRIPT_ROUTING", "1") == "1"
+
+# Per-section vectors: lessons are also embedded passage by passage into a
+# compact store, a lesson scores as its best-matching section (max-sim) and
+# that passage is returned instead of the whole lesson
+RAG_SECTION_VECTORS = os.getenv("RAG_SECTION_VECTORS", "0") == "1"
+RAG_SECTION_INDEX_TYPE = os.getenv("RAG_SECTION_INDEX_TYPE", "fp16")
+RAG_SECTION_CHARS = int(os.getenv("RAG_SECTION_CHARS", "500"))  # ~ the encoder's 128-token window
+RAG_SECTION_OVERSAMPLE = int(os.getenv("RAG_SECTION_OVERSAMPLE", "4"))  # Section hits fetched per lesson returned
+
+# Related lessons precomputed after indexing (nearest neighbours in the grade ± 1 band)
+RAG_RELATED_K = int(os.getenv("RAG_RELATED_K", "5"))
+
+# retrieve() result cache, invalidated whenever the index generation changes
+RAG_RESULT_CACHE_SIZE = int(os.getenv("RAG_RESULT_CACHE_SIZE", "1024"))
+
+# Sentence scoring for context compression: auto (embeddings once the model is
+# loaded and the embedding store can cache them, FTS5 highlight() matches
+# otherwise), embedding, or fts
+RAG_CONTEXT_SCORER = os.getenv("RAG_CONTEXT_SCORER", "auto")
+
+# Multi-worker deployments: forward retrieval to the shared RAG service
+# (python -m app.services.rag_service) at this Unix socket / named pipe
+RAG_SERVICE_ADDRESS = os.getenv("RAG_SERVICE_ADDRESS", "")
+
+# SQLite tuning for the long-lived per-thread connections
+SQLITE_MMAP_SIZE = int(os.getenv("RAG_SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+SQLITE_CACHED_STATEMENTS = int(os.getenv("RAG_SQLITE_CACHED_STATEMENTS", "128"))
+
+# Fixed SQL text so sqlite3's per-connection statement cache reuses prepared statements
+SQL_LESSON_BY_ID = """
+    SELECT lesson_id, grade, subject, title, lang, content, summary, keywords, difficulty
+    FROM lessons_meta
+    WHERE lesson_id = ?
+"""
+# Upsert keeps the row id stable, so the lessons_fts triggers see an UPDATE (not delete + insert)
+SQL_UPSERT_META = """
+    INSERT INTO lessons_meta
+    (lesson_id, grade, subject, title, lang, content, summary, keywords, difficulty, content_hash, simhash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(lesson_id) DO UPDATE SET
+        grade = excluded.grade,
+        subject = excluded.subject,
+        title = excluded.title,
+        lang = excluded.lang,
+        content = excluded.content,
+        summary = excluded.summary,
+        keywords = excluded.keywords,
+        difficulty = excluded.difficulty,
+        content_hash = excluded.content_hash,
+        simhash = excluded.simhash
+"""
+SQL_KEYWORD_SEARCH = """
+    SELECT
+        m.lesson_id, m.grade, m.subject, m.title, m.content, m.summary,
+        lessons_fts.rank
+    FROM lessons_fts
+    JOIN lessons_meta AS m ON m.id = lessons_fts.rowid
+    WHERE lessons_fts MATCH ? AND m.grade BETWEEN ? AND ?{filters}
+    ORDER BY lessons_fts.rank
+    LIMIT ?
+"""
+# highlight() marks matched terms in the content column with \x02 ... \x03
+SQL_HIGHLIGHT_CONTENT = """
+    SELECT m.lesson_id, highlight(lessons_fts, 1, char(2), char(3))
+    FROM lessons_fts
+    JOIN lessons_meta AS m ON m.id = lessons_fts.rowid
+    WHERE lessons_fts MATCH ? AND m.lesson_id IN ({placeholders})
+"""
+HIGHLIGHT_START, HIGHLIGHT_END = "\x02", "\x03"
+MAX_HIGHLIGHT_TERMS = 32
+
+# lessons_fts is an external-content index over lessons_meta: it stores only
+# the token index, the text itself lives once in lessons_meta
+SQL_CREATE_META = """
+    CREATE TABLE IF NOT EXISTS lessons_meta (
+        id INTEGER PRIMARY KEY,
+        lesson_id TEXT NOT NULL UNIQUE,
+        grade INTEGER NOT NULL,
+        subject TEXT NOT NULL,
+        title TEXT NOT NULL,
+        lang TEXT NOT NULL,
+        content TEXT,
+        summary TEXT,
+        keywords TEXT,
+        difficulty TEXT,
+        content_hash TEXT,
+        simhash INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+SQL_CREATE_FTS = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS lessons_fts USING fts5(
+        title,
+        content,
+        summary,
+        keywords,
+        content='lessons_meta',
+        content_rowid='id'
+    )
+"""
+SQL_CREATE_FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS lessons_meta_ai AFTER INSERT ON lessons_meta BEGIN
+        INSERT INTO lessons_fts (rowid, title, content, summary, keywords)
+        VALUES (new.id, new.title, new.content, new.summary, new.keywords);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lessons_meta_ad AFTER DELETE ON lessons_meta BEGIN
+        INSERT INTO lessons_fts (lessons_fts, rowid, title, content, summary, keywords)
+        VALUES ('delete', old.id, old.title, old.content, old.summary, old.keywords);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lessons_meta_au AFTER UPDATE OF title, content, summary, keywords ON lessons_meta BEGIN
+        INSERT INTO lessons_fts (lessons_fts, rowid, title, content, summary, keywords)
+        VALUES ('delete', old.id, old.title, old.content, old.summary, old.keywords);
+        INSERT INTO lessons_fts (rowid, title, content, summary, keywords)
+        VALUES (new.id, new.title, new.content, new.summary, new.keywords);
+    END
+    """,
+)
+SQL_CREATE_META_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_lessons_meta_scope ON lessons_meta(subject, lang, grade)",
+    "CREATE INDEX IF NOT EXISTS idx_lessons_meta_grade ON lessons_meta(grade)",
+)
+
+SQL_CREATE_RELATED = """
+    CREATE TABLE IF NOT EXISTS lesson_related (
+        lesson_id TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        related_id TEXT NOT NULL,
+        score REAL NOT NULL,
+        PRIMARY KEY (lesson_id, rank)
+    ) WITHOUT ROWID
+"""
+# Joined to lessons_meta so lessons deleted since the last build_related() are skipped
+SQL_RELATED = """
+    SELECT m.lesson_id, m.grade, m.subject, m.title, m.lang, m.summary, r.score
+    FROM lesson_related AS r
+    JOIN lessons_meta AS m ON m.lesson_id = r.related_id
+    WHERE r.lesson_id = ?
+    ORDER BY r.rank
+    LIMIT ?
+"""
+SQL_INSERT_RELATED = "INSERT INTO lesson_related (lesson_id, rank, related_id, score) VALUES (?, ?, ?, ?)"
+
+SQL_LESSON_SCOPES = "SELECT DISTINCT grade, subject, lang FROM lessons_meta"
+
+SQL_GET_GENERATION = "SELECT value FROM index_state WHERE key = 'generation'"
+SQL_BUMP_GENERATION = "UPDATE index_state SET value = value + 1 WHERE key = 'generation'"
+
+# Batch sizes for indexing
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+RELATED_BATCH_SIZE = 1024  # Lessons searched per FAISS call in build_related()
+SQLITE_MAX_VARIABLES = 500  # Stay well below SQLite's bound-parameter limit
+
+
+def load_embedder(model_name: str):
+    """Load the configured embedding backend (deferred import: torch / onnxruntime are heavy)"""
+    return create_embedder(RAG_EMBEDDER, model_name, ONNX_MODEL_DIR)
+
+
+def load_lesson_files(directories: list[Path]) -> list[dict[str, Any]]:
+    """Load all lesson JSON files (lists, {"items": [...]} or single lessons) under the directories"""
+    lessons: list[dict[str, Any]] = []
+    
+    for directory in directories:
+        if not directory.exists():
+            continue
+        
+        for file_path in directory.glob("**/*.json"):
+            try:
+                data = json.loads(file_path.read_text(encoding="utf-8"))
+                
+                if isinstance(data, list):
+                    lessons.extend(data)
+                elif isinstance(data, dict):
+                    if "items" in data and isinstance(data["items"], list):
+                        lessons.extend(data["items"])
+                    else:
+                        lessons.append(data)
+            
+            except Exception as e:
+                print(f"⚠️ Error loading {file_path}: {e}")
+    
+    return lessons
+
+
+def _batched(items: list, size: int):
+    """Yield consecutive slices of at most `size` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _normalize_lesson(lesson: dict[str, Any]) -> dict[str, Any]:
+    """Fill lesson defaults and compute the text to embed and its content hash"""
+    title = lesson.get("title", "Untitled")
+    lesson_id = lesson.get("lesson_id") or f"auto_{hashlib.sha1(title.encode('utf-8')).hexdigest()[:12]}"
+    keywords = lesson.get("keywords", "")
+    if isinstance(keywords, (list, tuple)):
+        keywords = " ".join(str(k) for k in keywords)
+    
+    record = {
+        "lesson_id": lesson_id,
+        "grade": lesson.get("grade", 0),
+        "subject": lesson.get("subject", "general"),
+        "title": title,
+        "lang": lesson.get("lang", "en"),
+        "content": lesson.get("content", ""),
+        "summary": lesson.get("summary", ""),
+        "keywords": keywords,
+        "difficulty": lesson.get("difficulty", "medium"),
+    }
+    # Prepare text for embedding (combine title + summary + content)
+    record["text"] = f"{record['title']}. {record['summary']}. {record['content']}".strip()
+    record["content_hash"] = hashlib.sha256(
+        json.dumps(record, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    # Content only: copies of a book under other titles still match
+    record["simhash"] = simhash(record["content"])
+    return record
+
+
+def _section_key(lesson_id: str, start: int, end: int) -> str:
+    """Section store id: the lesson plus the passage's character span in its content"""
+    return f"{lesson_id}#{start}-{end}"
+
+
+def _split_section_key(key: str) -> tuple[str, tuple[int, int]]:
+    lesson_id, _, span = key.rpartition("#")
+    start, end = span.split("-")
+    return lesson_id, (int(start), int(end))
+
+
+def _section_texts(record: dict[str, Any]) -> list[tuple[str, str]]:
+    """(section key, text to embed) per passage of a lesson, title first for context"""
+    return [
+        (_section_key(record["lesson_id"], start, end), f"{record['title']}. {record['content'][start:end]}")
+        for start, end in split_sections(record["content"], RAG_SECTION_CHARS)
+    ]
+
+
+def _marked_span(marked: str, text: str) -> str | None:
+    """
+    The part of highlight() output covering `text` (a section of the lesson
+    content), markers included; None when `text` is not part of the content
+    """
+    # Position in `marked` of every character of the unmarked content
+    positions = [i for i, char in enumerate(marked) if char not in (HIGHLIGHT_START, HIGHLIGHT_END)]
+    plain = "".join(marked[i] for i in positions)
+    start = plain.find(text)
+    if start < 0 or not text:
+        return None
+    # Keep markers that open just before or close just after the span
+    begin = positions[start]
+    while begin and marked[begin - 1] == HIGHLIGHT_START:
+        begin -= 1
+    stop = positions[start + len(text) - 1] + 1
+    while stop < len(marked) and marked[stop] == HIGHLIGHT_END:
+        stop += 1
+    return marked[begin:stop]
+
+
+def _doc_map_entry(record: dict[str, Any]) -> dict[str, Any]:
+    """Subset of a lesson the vector store needs to place it"""
+    return {key: record[key] for key in ("lesson_id", "grade", "subject", "lang")}
+
+
+_retrieval_executor: ThreadPoolExecutor | None = None
+_retrieval_executor_lock = threading.Lock()
+
+
+def _get_retrieval_executor() -> ThreadPoolExecutor:
+    """Shared bounded pool for retrieval legs (FAISS and SQLite release the GIL)"""
+    global _retrieval_executor
+    if _retrieval_executor is None:
+        with _retrieval_executor_lock:
+            if _retrieval_executor is None:
+                _retrieval_executor = ThreadPoolExecutor(
+                    max_workers=RAG_RETRIEVAL_WORKERS, thread_name_prefix="rag-retrieval"
+                )
+    return _retrieval_executor
+
 
 @dataclass
 class RAGResult:
@@ -49,97 +386,315 @@ class RAGResult:
     snippet: str
 
 
+def _merge_results(
+    vector_results: list[RAGResult], keyword_results: list[RAGResult], top_k: int
+) -> list[RAGResult]:
+    """
+    Combine the retrieval legs into one ranking
+    
+    FAISS inner products and FTS5 ranks are not on the same scale, so when
+    both legs return hits they are fused by rank (RRF) and relevance_score
+    becomes the fused score. A single leg keeps its own scores.
+    """
+    if vector_results and keyword_results:
+        fused: dict[str, RAGResult] = {}
+        scores: dict[str, float] = {}
+        for ranking in (vector_results, keyword_results):
+            ordered = sorted(ranking, key=lambda x: x.relevance_score, reverse=True)
+            for rank, result in enumerate(ordered, 1):
+                fused.setdefault(result.source, result)
+                scores[result.source] = scores.get(result.source, 0.0) + 1.0 / (RAG_RRF_K + rank)
+        best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        return [replace(fused[source], relevance_score=scores[source]) for source in best]
+    
+    # Deduplicate and sort by relevance
+    seen = set()
+    unique_results = []
+    for result in sorted(vector_results + keyword_results, key=lambda x: x.relevance_score, reverse=True):
+        if result.source not in seen:
+            seen.add(result.source)
+            unique_results.append(result)
+    
+    return unique_results[:top_k]
+
+
 class RAGEngine:
     """Retrieval Augmented Generation Engine"""
     
-    def __init__(self, use_vectors: bool = True):
+    def __init__(self, use_vectors: bool = True, background: bool = False):
         """
         Initialize RAG engine
         
         Args:
             use_vectors: Enable FAISS vector search (requires sentence-transformers)
+            background: Load the embedding model and FAISS index in a background
+                thread; retrieval is keyword-only until it is ready
         """
         self.db_path = DB_PATH
         self.vector_path = VECTOR_PATH
         self.use_vectors = use_vectors and FAISS_AVAILABLE
         
         self.embedder = None
-        self.index = None
-        self.doc_map: list[dict[str, Any]] = []
+        self.vectors, self.sections = self._new_vector_stores()
+        self._vectors_generation: int | None = None  # Index generation the stores match
+        self._reload_lock = threading.Lock()
+        
+        # One long-lived connection per thread (FastAPI runs sync routes in a threadpool)
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._conn_lock = threading.Lock()
         
         self._init_database()
-        if self.use_vectors:
+        
+        self.query_cache = QueryEmbeddingCache(
+            EMBEDDER_ID,
+            max_size=RAG_QUERY_CACHE_SIZE,
+            connect=self._connect if RAG_QUERY_CACHE_PERSIST else None,
+        )
+        self.result_cache = RetrievalCache(max_size=RAG_RESULT_CACHE_SIZE)
+        self._scopes: tuple[int, frozenset] | None = None  # (generation, indexed (grade, subject, lang))
+        self.embedding_store = EmbeddingStore(EMBEDDER_ID, self._connect) if RAG_EMBEDDING_STORE else None
+        
+        # Set once the embedding model + FAISS index are loaded (or failed to load)
+        self._vectors_loaded = threading.Event()
+        if not self.use_vectors:
+            self._vectors_loaded.set()
+        elif background:
+            threading.Thread(target=self._init_vectors, name="rag-warmup", daemon=True).start()
+        else:
             self._init_vectors()
     
+    @property
+    def vectors_ready(self) -> bool:
+        """True once vector search can be used"""
+        return self._vectors_loaded.is_set() and self.use_vectors
+    
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        """Block until background loading has finished"""
+        return self._vectors_loaded.wait(timeout)
+    
+    def status(self) -> dict[str, Any]:
+        """Readiness and cache counters for health checks"""
+        return {
+            "vectors_enabled": self.use_vectors,
+            "vectors_ready": self.vectors_ready,
+            "mode": "hybrid" if self.vectors_ready else "keyword",
+            "vector_count": self.vectors.ntotal if self.vectors_ready else 0,
+            "index_type": self.vectors.index_type,
+            "index_dim": self.vectors.index_dim,
+            "partitions": len(self.vectors.partitions) if self.vectors_ready else 0,
+            "flat_partitions": self.vectors.staging_partitions if self.vectors_ready else 0,
+            "section_count": self.sections.ntotal if self.vectors_ready and RAG_SECTION_VECTORS else 0,
+            "embedder": RAG_EMBEDDER,
+            "query_cache": self.query_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+            "embedding_store": self.embedding_store.stats() if self.embedding_store else None,
+        }
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get this thread's pooled connection to knowledge.db
+        
+        Connections are opened once per thread in WAL mode with memory-mapped
+        reads, and reused for every query so prepared statements stay cached.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                str(self.db_path),
+                cached_statements=SQLITE_CACHED_STATEMENTS,
+                check_same_thread=False,  # Only so close() can run from another thread
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+            with self._conn_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close(self):
+        """Close all pooled SQLite connections"""
+        with self._conn_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+    
     def _init_database(self):
         """Initialize SQLite database for metadata and full-text search"""
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         
-        conn = sqlite3.connect(str(self.db_path))
+        conn = self._connect()
         cursor = conn.cursor()
         
-        # Create lessons table with FTS5 for full-text search
-        cursor.execute("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS lessons_fts USING fts5(
-                lesson_id UNINDEXED,
-                grade UNINDEXED,
-                subject UNINDEXED,
-                title,
-                lang UNINDEXED,
-                content,
-                summary,
-                keywords
-            )
-        """)
+        # Databases created before the external-content FTS index are rebuilt in place
+        migrated = self._migrate_legacy_schema(cursor)
+        
+        # Lesson text and metadata (the single copy of every chunk)
+        cursor.execute(SQL_CREATE_META)
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(lessons_meta)")}
+        if "simhash" not in columns:
+            cursor.execute("ALTER TABLE lessons_meta ADD COLUMN simhash INTEGER")  # Filled in lazily
+        for statement in SQL_CREATE_META_INDEXES:
+            cursor.execute(statement)
         
-        # Create metadata table
+        # Full-text index over lessons_meta, kept in sync by triggers
+        fts_exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lessons_fts'"
+        ).fetchone()
+        cursor.execute(SQL_CREATE_FTS)
+        for statement in SQL_CREATE_FTS_TRIGGERS:
+            cursor.execute(statement)
+        if not fts_exists:
+            cursor.execute("INSERT INTO lessons_fts (lessons_fts) VALUES ('rebuild')")
+        
+        # Index generation, bumped on every index write (shared with CLI indexers)
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS lessons_meta (
-                lesson_id TEXT PRIMARY KEY,
-                grade INTEGER NOT NULL,
-                subject TEXT NOT NULL,
-                title TEXT NOT NULL,
-                lang TEXT NOT NULL,
-                content TEXT,
-                summary TEXT,
-                keywords TEXT,
-                difficulty TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            CREATE TABLE IF NOT EXISTS index_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
             )
         """)
+        cursor.execute("INSERT OR IGNORE INTO index_state (key, value) VALUES ('generation', 0)")
+        
+        # Precomputed related lessons (see build_related)
+        cursor.execute(SQL_CREATE_RELATED)
         
         conn.commit()
-        conn.close()
+        
+        if migrated:
+            conn.execute("VACUUM")  # Give the duplicated FTS content back to the filesystem
+            print("✅ Migrated knowledge.db to an external-content FTS index")
+    
+    def _migrate_legacy_schema(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Convert the old layout (FTS table with its own copy of every lesson,
+        lessons_meta keyed by lesson_id only) to the current one
+        
+        lessons_meta is copied into a table with a stable INTEGER PRIMARY KEY
+        for the FTS rowid, and the old lessons_fts is dropped so it can be
+        rebuilt from lessons_meta.
+        
+        Returns:
+            True if anything was migrated
+        """
+        migrated = False
+        
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(lessons_meta)")]
+        if columns and "id" not in columns:
+            print("🔧 Migrating lessons_meta to a rowid-keyed table...")
+            copied = [
+                column for column in (
+                    "lesson_id", "grade", "subject", "title", "lang", "content",
+                    "summary", "keywords", "difficulty", "content_hash", "created_at",
+                )
+                if column in columns
+            ]
+            column_list = ", ".join(copied)
+            cursor.execute("ALTER TABLE lessons_meta RENAME TO lessons_meta_legacy")
+            cursor.execute(SQL_CREATE_META)
+            cursor.execute(
+                f"INSERT INTO lessons_meta ({column_list}) "
+                f"SELECT {column_list} FROM lessons_meta_legacy ORDER BY rowid"
+            )
+            cursor.execute("DROP TABLE lessons_meta_legacy")
+            migrated = True
+        
+        row = cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'lessons_fts'").fetchone()
+        if row and "content='lessons_meta'" not in row[0]:
+            print("🔧 Dropping the self-contained lessons_fts table...")
+            cursor.execute("DROP TABLE lessons_fts")
+            migrated = True
+        
+        return migrated
+    
+    @property
+    def index_generation(self) -> int:
+        """Counter bumped by every write to the lesson index"""
+        row = self._connect().execute(SQL_GET_GENERATION).fetchone()
+        return row[0] if row else 0
+    
+    def _bump_generation(self):
+        """Invalidate cached retrieval results (call after SQLite and vectors are both written)"""
+        with self._connect() as conn:
+            conn.execute(SQL_BUMP_GENERATION)
+            generation = conn.execute(SQL_GET_GENERATION).fetchone()[0]
+        # The stores already hold this write; only writes by other processes need a reload
+        if self._vectors_generation == generation - 1:
+            self._vectors_generation = generation
+    
+    def _new_vector_stores(self) -> tuple[PartitionedVectorStore, PartitionedVectorStore]:
+        """(lesson store, section store), empty until load()"""
+        vectors = PartitionedVectorStore(
+            VECTOR_DIR, VECTOR_MAP_PATH, index_type=RAG_INDEX_TYPE, mmap=RAG_INDEX_MMAP,
+            rerank_factor=RAG_BINARY_RERANK_FACTOR, reduce_dim=RAG_INDEX_PCA_DIM,
+        )
+        sections = PartitionedVectorStore(
+            SECTION_VECTOR_DIR, SECTION_VECTOR_DIR / "docmap.npz", index_type=RAG_SECTION_INDEX_TYPE,
+            mmap=RAG_INDEX_MMAP, rerank_factor=RAG_BINARY_RERANK_FACTOR, reduce_dim=RAG_INDEX_PCA_DIM,
+        )
+        return vectors, sections
+    
+    def _refresh_vectors(self, generation: int):
+        """
+        Reload the vector partitions after another process (pdf_indexer,
+        index_content in a CLI) wrote the index
+        
+        The new stores are loaded beside the current ones and swapped in, so
+        searches already running finish on the old partitions.
+        """
+        if not self.vectors_ready or self._vectors_generation in (None, generation):
+            return
+        with self._reload_lock:
+            if self._vectors_generation == generation:
+                return
+            vectors, sections = self._new_vector_stores()
+            try:
+                vectors.load()
+                if RAG_SECTION_VECTORS:
+                    sections.load()
+            except Exception as e:
+                print(f"⚠️ Vector reload failed, keeping the loaded partitions: {e}")
+            else:
+                self.vectors, self.sections = vectors, sections
+                print(f"🔄 Reloaded {len(vectors.partitions)} vector partitions (index generation {generation})")
+            self._vectors_generation = generation
     
     def _init_vectors(self):
         """Initialize FAISS vector index and embedding model"""
         if not FAISS_AVAILABLE:
-            print("⚠️ FAISS not available. Install: pip install faiss-cpu sentence-transformers")
+            print(f"⚠️ FAISS or the {RAG_EMBEDDER} backend is not available. Install: pip install -r requirements-rag.txt")
             self.use_vectors = False
+            self._vectors_loaded.set()
             return
         
         try:
             # Load lightweight multilingual embedding model (118MB)
-            print(f"📦 Loading embedding model: {EMBEDDING_MODEL}")
-            self.embedder = SentenceTransformer(EMBEDDING_MODEL)
+            print(f"📦 Loading embedding model: {EMBEDDING_MODEL} ({RAG_EMBEDDER})")
+            self.embedder = load_embedder(EMBEDDING_MODEL)
             
-            # Load or create FAISS index
-            if self.vector_path.exists():
-                print(f"📂 Loading vector index from {self.vector_path}")
-                self.index = faiss.read_index(str(self.vector_path))
-                
-                # Load document mapping
-                map_path = self.vector_path.with_suffix(".json")
-                if map_path.exists():
-                    self.doc_map = json.loads(map_path.read_text(encoding="utf-8"))
+            # Read first, so a write that lands while loading triggers a reload
+            generation = self.index_generation
+            
+            # Load partitioned FAISS indexes (migrating a legacy single index if present)
+            if self.vectors.load(legacy_map_path=LEGACY_MAP_PATH):
+                print(f"📂 Loaded {len(self.vectors.partitions)} vector partitions from {VECTOR_DIR}")
+            elif self.vectors.migrate_flat_index(self.vector_path, LEGACY_MAP_PATH):
+                print(f"📂 Migrated {self.vectors.ntotal} vectors into {len(self.vectors.partitions)} partitions")
             else:
-                print("🔨 Creating new FAISS index")
-                # Create empty index (384 dimensions for MiniLM)
-                self.index = faiss.IndexFlatIP(384)  # Inner Product for cosine similarity
+                print("🔨 Creating new partitioned FAISS index")
+            if RAG_SECTION_VECTORS and self.sections.load():
+                print(f"📂 Loaded {self.sections.ntotal} section vectors from {SECTION_VECTOR_DIR}")
+            self._vectors_generation = generation
         
         except Exception as e:
             print(f"⚠️ Vector initialization failed: {e}")
             self.use_vectors = False
+        
+        finally:
+            self._vectors_loaded.set()
     
     def index_content(self, force_rebuild: bool = False):
         """
@@ -148,115 +703,362 @@ class RAGEngine:
         Args:
             force_rebuild: Clear and rebuild entire index
         """
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
         if force_rebuild:
             print("🗑️ Clearing existing index...")
-            cursor.execute("DELETE FROM lessons_fts")
-            cursor.execute("DELETE FROM lessons_meta")
+            with self._connect() as conn:
+                conn.execute("DELETE FROM lessons_meta")  # Triggers clear lessons_fts
+            self.wait_until_ready()
             if self.use_vectors:
-                self.index = faiss.IndexFlatIP(384)
-                self.doc_map = []
+                self.vectors.reset()
+                self.sections.reset()
+            self._bump_generation()
         
         # Load all lessons
         lessons = self._load_all_lessons()
         print(f"📚 Found {len(lessons)} lessons to index")
         
-        texts_to_embed = []
-        lessons_to_insert = []
-        
-        for lesson in lessons:
-            lesson_id = lesson.get("lesson_id", f"auto_{hash(lesson.get('title', ''))}")
-            grade = lesson.get("grade", 0)
-            subject = lesson.get("subject", "general")
-            title = lesson.get("title", "Untitled")
-            lang = lesson.get("lang", "en")
-            content = lesson.get("content", "")
-            summary = lesson.get("summary", "")
-            keywords = lesson.get("keywords", "")
-            difficulty = lesson.get("difficulty", "medium")
-            
+        stats = self.upsert_documents(lessons)
+        print(
+            f"✅ Indexed {len(lessons)} lessons successfully "
+            f"({stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+            f"{stats['duplicates']} near-duplicates dropped)"
+        )
+        
+        if force_rebuild:
+            pruned = self.prune_embedding_store()
+            if pruned:
+                print(f"🧹 Pruned {pruned} unused stored embeddings")
+        
+        linked = self.build_related()
+        if linked:
+            print(f"🔗 Stored related lessons for {linked} lessons")
+    
+    def upsert_documents(self, docs: list[dict[str, Any]], batch_size: int = EMBED_BATCH_SIZE) -> dict[str, int]:
+        """
+        Insert or update lessons without reloading the rest of the corpus
+        
+        Unchanged lessons (same content hash) are skipped, near-duplicates of
+        an indexed chunk of the same grade and subject are dropped, changed
+        ones are re-embedded in batches (text already in the embedding store
+        is not encoded again), and the vector index is written once at the end.
+        With RAG_SECTION_VECTORS, changed lessons and unchanged ones that have
+        no section vectors yet are also embedded section by section (lessons
+        without content, e.g. summary-only ones, have no sections).
+        
+        Args:
+            docs: Lesson dicts (lesson_id, grade, subject, title, lang, content, ...)
+            batch_size: Embedding batch size
+        
+        Returns:
+            Counts of inserted, updated, unchanged, duplicate and skipped lessons
+        """
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "skipped": 0}
+        self.wait_until_ready()  # Embeddings need the model
+        
+        records: dict[str, dict[str, Any]] = {}
+        for doc in docs:
+            record = _normalize_lesson(doc)
             # Ensure grade is within LKG-6th (0-7)
-            if grade > 7:
-                continue  # Skip higher grades per requirements
-            
-            # Prepare text for embedding (combine title + summary + content)
-            text_to_embed = f"{title}. {summary}. {content}".strip()
-            
-            # Insert into FTS table
-            cursor.execute("""
-                INSERT OR REPLACE INTO lessons_fts 
-                (lesson_id, grade, subject, title, lang, content, summary, keywords)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (lesson_id, grade, subject, title, lang, content, summary, keywords))
+            if record["grade"] > 7:
+                stats["skipped"] += 1  # Skip higher grades per requirements
+                continue
+            records[record["lesson_id"]] = record  # Last one wins within a batch
+        
+        known_hashes = self._fetch_content_hashes(list(records))
+        changed = [
+            record for record in records.values()
+            if known_hashes.get(record["lesson_id"], "") != record["content_hash"]
+        ]
+        stats["unchanged"] = len(records) - len(changed)
+        
+        duplicates = self._find_near_duplicates(changed, list(records.values())) if RAG_DEDUPE else {}
+        if duplicates:
+            changed = [r for r in changed if r["lesson_id"] not in duplicates]
+            stats["duplicates"] = len(duplicates)
+            print(f"🧹 Dropped {len(duplicates)} near-duplicate chunks")
+            # A lesson whose new version duplicates another chunk must not keep its old version
+            replaced = [lesson_id for lesson_id in duplicates if lesson_id in known_hashes]
+            if replaced:
+                self.delete_documents(replaced)
+        
+        for record in changed:
+            stats["updated" if record["lesson_id"] in known_hashes else "inserted"] += 1
+        
+        to_section = []
+        if self.use_vectors and RAG_SECTION_VECTORS:
+            # Lessons indexed before section vectors were enabled get them now
+            sectioned = {_split_section_key(key)[0] for key in self.sections.locations}
+            to_section = changed + [
+                r for r in records.values()
+                if known_hashes.get(r["lesson_id"]) == r["content_hash"] and r["lesson_id"] not in sectioned
+                and split_sections(r["content"], RAG_SECTION_CHARS)
+            ]
+        
+        if not changed and not to_section:
+            return stats
+        
+        # Vectors first: lessons_meta holds the content hashes, so if indexing is
+        # interrupted the lessons still count as changed on the next run
+        to_embed = [r for r in changed if r["text"]]
+        if self.use_vectors and to_embed:
+            print(f"🧠 Generating embeddings for {len(to_embed)} lessons...")
+            encoded = 0
+            for batch in _batched(to_embed, batch_size):
+                embeddings, computed = self._embed_documents([r["text"] for r in batch], batch_size)
+                encoded += computed
+                self.vectors.upsert([_doc_map_entry(r) for r in batch], embeddings)
+            if encoded < len(to_embed):
+                print(f"♻️ Reused {len(to_embed) - encoded} stored embeddings, encoded {encoded}")
             
-            # Insert into metadata table
-            cursor.execute("""
-                INSERT OR REPLACE INTO lessons_meta
-                (lesson_id, grade, subject, title, lang, content, summary, keywords, difficulty)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (lesson_id, grade, subject, title, lang, content, summary, keywords, difficulty))
+            # Save partitions and mapping once per call
+            print(f"💾 Saving vector partitions to {VECTOR_DIR}")
+            self.vectors.save()
+        
+        if to_section:
+            self._index_sections(to_section, batch_size)
+        
+        # lessons_fts follows lessons_meta through its triggers
+        with self._connect() as conn:
+            conn.executemany(SQL_UPSERT_META, [
+                (r["lesson_id"], r["grade"], r["subject"], r["title"], r["lang"],
+                 r["content"], r["summary"], r["keywords"], r["difficulty"], r["content_hash"], r["simhash"])
+                for r in changed
+            ])
+        
+        self._bump_generation()
+        return stats
+    
+    def _index_sections(self, records: list[dict[str, Any]], batch_size: int = EMBED_BATCH_SIZE):
+        """Replace the section vectors of lessons with embeddings of their current passages"""
+        stale = self._section_keys([r["lesson_id"] for r in records])
+        sections = [
+            (_doc_map_entry(record), key, text)
+            for record in records for key, text in _section_texts(record)
+        ]
+        if not stale and not sections:
+            return
+        self.sections.remove(stale)
+        
+        print(f"🧩 Embedding {len(sections)} sections of {len(records)} lessons...")
+        for batch in _batched(sections, batch_size):
+            embeddings, _ = self._embed_documents([text for _, _, text in batch], batch_size)
+            self.sections.upsert([{**entry, "lesson_id": key} for entry, key, _ in batch], embeddings)
+        self.sections.save()
+    
+    def _section_keys(self, lesson_ids: list[str]) -> list[str]:
+        """Section store ids belonging to the given lessons"""
+        wanted = set(lesson_ids)
+        return [key for key in self.sections.locations if _split_section_key(key)[0] in wanted]
+    
+    def _find_near_duplicates(self, records: list[dict[str, Any]], batch: list[dict[str, Any]]) -> dict[str, str]:
+        """
+        Map lesson_id -> lesson_id it nearly duplicates, for records that repeat
+        an indexed chunk or an earlier record of the same grade and subject
+        
+        Indexed rows of lessons in the batch are not compared against: their old
+        versions are being replaced (a re-extracted PDF whose chunks shifted by
+        one paragraph would otherwise match its own previous chunks).
+        
+        Args:
+            records: Changed records to check, in batch order
+            batch: Every record of the upsert; the unchanged ones count as accepted
+        """
+        candidates = [r for r in records if r["simhash"] is not None]
+        if not candidates:
+            return {}
+        
+        batch_ids = {r["lesson_id"] for r in batch}
+        checked = {r["lesson_id"] for r in records}
+        index = NearDuplicateIndex(RAG_DEDUPE_MAX_DISTANCE)
+        conn = self._connect()
+        for grade, subject in {(r["grade"], r["subject"]) for r in candidates}:
+            for lesson_id, fingerprint in conn.execute(
+                "SELECT lesson_id, simhash FROM lessons_meta WHERE subject = ? AND grade = ? AND simhash IS NOT NULL",
+                (subject, grade)
+            ):
+                if lesson_id not in batch_ids:
+                    index.add((grade, subject), fingerprint, lesson_id)
             
-            if self.use_vectors and text_to_embed:
-                texts_to_embed.append(text_to_embed)
-                lessons_to_insert.append({
-                    "lesson_id": lesson_id,
-                    "grade": grade,
-                    "subject": subject,
-                    "title": title,
-                    "lang": lang,
-                })
+            # Rows indexed before fingerprints were stored (or too short to have one)
+            backfill = []
+            for row_id, lesson_id, content in conn.execute(
+                "SELECT id, lesson_id, content FROM lessons_meta WHERE subject = ? AND grade = ? AND simhash IS NULL",
+                (subject, grade)
+            ).fetchall():
+                fingerprint = simhash(content or "")
+                if fingerprint is not None:
+                    if lesson_id not in batch_ids:
+                        index.add((grade, subject), fingerprint, lesson_id)
+                    backfill.append((fingerprint, row_id))
+            if backfill:
+                with conn:
+                    conn.executemany("UPDATE lessons_meta SET simhash = ? WHERE id = ?", backfill)
         
-        conn.commit()
-        conn.close()
-        
-        # Create vector embeddings
-        if self.use_vectors and texts_to_embed:
-            print(f"🧠 Generating embeddings for {len(texts_to_embed)} lessons...")
-            embeddings = self.embedder.encode(
-                texts_to_embed, 
-                show_progress_bar=True,
+        # Unchanged lessons of the batch stay indexed as they are
+        for record in batch:
+            if record["lesson_id"] not in checked and record["simhash"] is not None:
+                index.add((record["grade"], record["subject"]), record["simhash"], record["lesson_id"])
+        
+        duplicates = {}
+        for record in candidates:
+            scope = (record["grade"], record["subject"])
+            match = index.find(scope, record["simhash"], exclude=record["lesson_id"])
+            if match:
+                duplicates[record["lesson_id"]] = match
+            else:
+                index.add(scope, record["simhash"], record["lesson_id"])
+        return duplicates
+    
+    def _embed_documents(self, texts: list[str], batch_size: int = EMBED_BATCH_SIZE):
+        """
+        Embed lesson texts, reusing the embedding store where the text was seen before
+        
+        Returns:
+            (embeddings, number of texts actually encoded)
+        """
+        def encode(batch: list[str]):
+            return self.embedder.encode(
+                batch,
+                batch_size=batch_size,
                 normalize_embeddings=True  # For cosine similarity
             )
-            
-            # Add to FAISS index
-            self.index.add(np.array(embeddings, dtype=np.float32))
-            self.doc_map.extend(lessons_to_insert)
-            
-            # Save index and mapping
-            print(f"💾 Saving vector index to {self.vector_path}")
-            faiss.write_index(self.index, str(self.vector_path))
-            
-            map_path = self.vector_path.with_suffix(".json")
-            map_path.write_text(json.dumps(self.doc_map, ensure_ascii=False, indent=2), encoding="utf-8")
         
-        print(f"✅ Indexed {len(lessons)} lessons successfully")
+        if self.embedding_store is None:
+            return encode(texts), len(texts)
+        return self.embedding_store.embed(texts, encode)
     
-    def _load_all_lessons(self) -> list[dict[str, Any]]:
-        """Load all lesson JSON files from content directories"""
-        lessons: list[dict[str, Any]] = []
+    def prune_embedding_store(self) -> int:
+        """Drop stored embeddings of text (lessons, sections, sentences) no longer in lessons_meta"""
+        if self.embedding_store is None:
+            return 0
+        cursor = self._connect().execute("SELECT lesson_id, title, summary, content FROM lessons_meta")
+        texts = []
+        for lesson_id, title, summary, content in cursor.fetchall():
+            record = _normalize_lesson({"lesson_id": lesson_id, "title": title, "summary": summary, "content": content})
+            texts.append(record["text"])
+            # Sentences cached by the context scorer (compress_results)
+            texts.extend(split_sentences(content or ""))
+            texts.extend(split_sentences(summary or ""))
+            if RAG_SECTION_VECTORS:
+                texts.extend(text for _, text in _section_texts(record))
+        return self.embedding_store.prune(texts)
+    
+    def delete_documents(self, lesson_ids: list[str]) -> int:
+        """
+        Remove lessons from SQLite and the vector index
         
-        for directory in [CONTENT_DIR, LESSON_DIR]:
-            if not directory.exists():
-                continue
-            
-            for file_path in directory.glob("**/*.json"):
-                try:
-                    data = json.loads(file_path.read_text(encoding="utf-8"))
-                    
-                    if isinstance(data, list):
-                        lessons.extend(data)
-                    elif isinstance(data, dict):
-                        if "items" in data and isinstance(data["items"], list):
-                            lessons.extend(data["items"])
-                        else:
-                            lessons.append(data)
-                
-                except Exception as e:
-                    print(f"⚠️ Error loading {file_path}: {e}")
+        Returns:
+            Number of lessons removed from lessons_meta
+        """
+        self.wait_until_ready()
+        removed = 0
+        conn = self._connect()
+        with conn:
+            for batch in _batched(list(lesson_ids), SQLITE_MAX_VARIABLES):
+                placeholders = ",".join("?" * len(batch))
+                cursor = conn.execute(f"DELETE FROM lessons_meta WHERE lesson_id IN ({placeholders})", batch)
+                removed += cursor.rowcount
+        
+        if self.use_vectors and self.vectors.remove(list(lesson_ids)):
+            self.vectors.save()
+        if self.use_vectors and self.sections.remove(self._section_keys(lesson_ids)):
+            self.sections.save()
+        
+        if removed:
+            self._bump_generation()
+        
+        return removed
+    
+    def build_related(self, k: int = RAG_RELATED_K) -> int:
+        """
+        Precompute each lesson's k nearest neighbours for related()
+        
+        Every partition's stored vectors are searched against the partitions of
+        the same subject and language in the grade ± 1 band, and the whole
+        lesson_related table is replaced. Run after indexing; lessons added
+        later have no related lessons until the next run.
+        
+        Returns:
+            Number of lessons with stored neighbours
+        """
+        self.wait_until_ready()
+        if not self.vectors_ready:
+            print("⚠️ Vector search is not available, related lessons not built")
+            return 0
+        
+        rows = []
+        linked = 0
+        for key in list(self.vectors.partitions):
+            docs, vectors = self.vectors.partition_vectors(key)
+            for start in range(0, len(docs), RELATED_BATCH_SIZE):
+                batch = docs[start:start + RELATED_BATCH_SIZE]
+                first = batch[0]
+                # One extra hit because every lesson finds itself
+                hits = self.vectors.search_batch(
+                    vectors[start:start + RELATED_BATCH_SIZE], first["grade"], first["subject"], first["lang"], k + 1
+                )
+                for doc, doc_hits in zip(batch, hits):
+                    neighbours = [
+                        (hit["lesson_id"], score) for hit, score in doc_hits if hit["lesson_id"] != doc["lesson_id"]
+                    ]
+                    rows.extend(
+                        (doc["lesson_id"], rank, related_id, score)
+                        for rank, (related_id, score) in enumerate(neighbours[:k])
+                    )
+                    linked += bool(neighbours)
+        
+        with self._connect() as conn:
+            conn.execute("DELETE FROM lesson_related")
+            conn.executemany(SQL_INSERT_RELATED, rows)
+        return linked
+    
+    def related(self, lesson_id: str, limit: int = RAG_RELATED_K) -> list[dict[str, Any]]:
+        """
+        Lessons similar to lesson_id, from the table written by build_related()
         
-        return lessons
+        A single indexed lookup: no embedding model or FAISS search is needed.
+        
+        Returns:
+            Lesson summaries (lesson_id, grade, subject, title, lang, summary, score), most similar first
+        """
+        rows = self._connect().execute(SQL_RELATED, (lesson_id, limit)).fetchall()
+        return [
+            {
+                "lesson_id": row[0],
+                "grade": row[1],
+                "subject": row[2],
+                "title": row[3],
+                "lang": row[4],
+                "summary": row[5] or "",
+                "score": row[6],
+            }
+            for row in rows
+        ]
+    
+    def document_ids(self, prefix: str = "") -> list[str]:
+        """Indexed lesson ids, optionally restricted to a prefix"""
+        cursor = self._connect().execute(
+            "SELECT lesson_id FROM lessons_meta WHERE lesson_id >= ? AND lesson_id < ? ORDER BY lesson_id",
+            (prefix, prefix + "\uffff")
+        )
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _fetch_content_hashes(self, lesson_ids: list[str]) -> dict[str, str | None]:
+        """Stored content hash per known lesson_id"""
+        hashes: dict[str, str | None] = {}
+        conn = self._connect()
+        for batch in _batched(lesson_ids, SQLITE_MAX_VARIABLES):
+            placeholders = ",".join("?" * len(batch))
+            cursor = conn.execute(
+                f"SELECT lesson_id, content_hash FROM lessons_meta WHERE lesson_id IN ({placeholders})",
+                batch
+            )
+            hashes.update(cursor.fetchall())
+        return hashes
+    
+    def _load_all_lessons(self) -> list[dict[str, Any]]:
+        """Load all lesson JSON files from content directories"""
+        return load_lesson_files([CONTENT_DIR, LESSON_DIR])
     
     def retrieve(
         self,
@@ -270,126 +1072,321 @@ class RAGEngine:
         """
         Retrieve relevant content for a query
         
+        In hybrid mode the keyword leg runs on the retrieval executor while the
+        vector leg runs on the calling thread, and the two rankings are merged
+        with reciprocal rank fusion.
+        
+        The query is routed to the language of its script (see _route_lang),
+        so a child typing English in Tamil mode searches English lessons.
+        
         Args:
             query: User's question or topic
             grade: Student's grade (0=LKG, 1=UKG, 2=1st, ..., 7=6th)
             subject: Filter by subject (tamil, english, maths, science, evs, etc.)
-            lang: Preferred language (ta, en)
+            lang: Preferred language (ta, en), used for mixed-script queries
             top_k: Number of results to return
             method: "vector", "keyword", or "hybrid"
         
         Returns:
             List of RAGResult objects sorted by relevance
         """
-        results: list[RAGResult] = []
+        generation, lang, cache_key, cached = self._lookup(query, grade, subject, lang, top_k, method)
+        if cached is not None:
+            return cached
         
-        # Vector search
-        if method in ["vector", "hybrid"] and self.use_vectors and self.embedder:
-            vector_results = self._vector_search(query, grade, subject, lang, top_k)
-            results.extend(vector_results)
+        method, vectors_ready = self._resolve_method(method)
+        run_vector = method in ["vector", "hybrid"] and vectors_ready
+        run_keyword = method in ["keyword", "hybrid"]
         
-        # Keyword search
-        if method in ["keyword", "hybrid"]:
+        vector_results: list[RAGResult] = []
+        keyword_results: list[RAGResult] = []
+        if run_vector and run_keyword:
+            keyword_future = _get_retrieval_executor().submit(
+                self._keyword_search, query, grade, subject, lang, top_k
+            )
+            vector_results = self._vector_search(query, grade, subject, lang, top_k)
+            keyword_results = keyword_future.result()
+        elif run_vector:
+            vector_results = self._vector_search(query, grade, subject, lang, top_k)
+        elif run_keyword:
             keyword_results = self._keyword_search(query, grade, subject, lang, top_k)
-            results.extend(keyword_results)
         
-        # Deduplicate and sort by relevance
-        seen = set()
-        unique_results = []
-        for result in sorted(results, key=lambda x: x.relevance_score, reverse=True):
-            if result.source not in seen:
-                seen.add(result.source)
-                unique_results.append(result)
-        
-        return unique_results[:top_k]
+        results = _merge_results(vector_results, keyword_results, top_k)
+        if vectors_ready or not self.use_vectors:
+            self.result_cache.put(cache_key, generation, results)
+        return results
     
-    def _vector_search(
-        self, query: str, grade: int, subject: str | None, lang: str | None, top_k: int
+    async def retrieve_async(
+        self,
+        query: str,
+        grade: int,
+        subject: str | None = None,
+        lang: str | None = None,
+        top_k: int = 3,
+        method: str = "hybrid"
     ) -> list[RAGResult]:
-        """Semantic vector search using FAISS"""
-        if not self.use_vectors or self.index.ntotal == 0:
+        """
+        retrieve() for async callers: both legs run concurrently on the
+        retrieval executor, so the event loop is never blocked by FAISS or FTS
+        (the generation and cache lookup, which read SQLite, run there too)
+        """
+        loop = asyncio.get_running_loop()
+        executor = _get_retrieval_executor()
+        generation, lang, cache_key, cached = await loop.run_in_executor(
+            executor, self._lookup, query, grade, subject, lang, top_k, method
+        )
+        if cached is not None:
+            return cached
+        
+        method, vectors_ready = self._resolve_method(method)
+        
+        async def no_results() -> list[RAGResult]:
             return []
         
-        # Generate query embedding
-        query_embedding = self.embedder.encode(
-            [query], 
-            normalize_embeddings=True
+        vector_leg = (
+            loop.run_in_executor(executor, self._vector_search, query, grade, subject, lang, top_k)
+            if method in ["vector", "hybrid"] and vectors_ready else no_results()
         )
+        keyword_leg = (
+            loop.run_in_executor(executor, self._keyword_search, query, grade, subject, lang, top_k)
+            if method in ["keyword", "hybrid"] else no_results()
+        )
+        vector_results, keyword_results = await asyncio.gather(vector_leg, keyword_leg)
+        
+        results = _merge_results(vector_results, keyword_results, top_k)
+        if vectors_ready or not self.use_vectors:
+            self.result_cache.put(cache_key, generation, results)
+        return results
+    
+    def _lookup(
+        self, query: str, grade: int, subject: str | None, lang: str | None, top_k: int, method: str
+    ) -> tuple[int, str | None, tuple, list[RAGResult] | None]:
+        """(index generation, routed lang, result cache key, cached results or None) for a query"""
+        generation = self.index_generation
+        self._refresh_vectors(generation)
+        lang = self._route_lang(query, grade, subject, lang, generation)
+        cache_key = RetrievalCache.make_key(query, grade, subject, lang, top_k, method)
+        return generation, lang, cache_key, self.result_cache.get(cache_key, generation)
+    
+    def retrieve_many(
+        self,
+        queries: list[str],
+        grade: int,
+        subject: str | None = None,
+        lang: str | None = None,
+        top_k: int = 3,
+        method: str = "hybrid"
+    ) -> list[list[RAGResult]]:
+        """
+        retrieve() for a batch of queries sharing the same filters
         
-        # Search FAISS index
-        scores, indices = self.index.search(np.array(query_embedding, dtype=np.float32), top_k * 3)
+        Uncached queries routed to the same language are embedded in one
+        encode call and searched with one FAISS call per partition; their
+        keyword searches run concurrently on the retrieval executor.
         
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx == -1 or idx >= len(self.doc_map):
-                continue
-            
-            doc = self.doc_map[idx]
-            
-            # Filter by grade (allow current grade ± 1)
-            if abs(doc["grade"] - grade) > 1:
-                continue
-            
-            # Filter by subject
-            if subject and doc["subject"] != subject:
-                continue
-            
-            # Filter by language
-            if lang and doc["lang"] != lang:
-                continue
-            
-            # Get full content from database
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT content, summary FROM lessons_meta WHERE lesson_id = ?",
-                (doc["lesson_id"],)
-            )
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row:
-                content, summary = row
-                results.append(RAGResult(
-                    content=content or summary or "",
-                    source=doc["lesson_id"],
-                    grade=doc["grade"],
-                    subject=doc["subject"],
-                    relevance_score=float(score),
-                    snippet=summary or content[:200] if content else ""
-                ))
+        Returns:
+            One result list per query, in the order given
+        """
+        generation = self.index_generation
+        self._refresh_vectors(generation)
+        langs = [self._route_lang(q, grade, subject, lang, generation) for q in queries]
+        cache_keys = [
+            RetrievalCache.make_key(q, grade, subject, query_lang, top_k, method)
+            for q, query_lang in zip(queries, langs)
+        ]
+        results: list[list[RAGResult] | None] = [self.result_cache.get(key, generation) for key in cache_keys]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        if not pending:
+            return results
+        
+        method, vectors_ready = self._resolve_method(method)
+        run_vector = method in ["vector", "hybrid"] and vectors_ready
+        run_keyword = method in ["keyword", "hybrid"]
         
+        keyword_futures = {}
+        if run_keyword:
+            executor = _get_retrieval_executor()
+            keyword_futures = {
+                i: executor.submit(self._keyword_search, queries[i], grade, subject, langs[i], top_k)
+                for i in pending
+            }
+        vector_hits: dict[int, list[RAGResult]] = {}
+        if run_vector:
+            by_lang: dict[str | None, list[int]] = {}
+            for i in pending:
+                by_lang.setdefault(langs[i], []).append(i)
+            for query_lang, indices in by_lang.items():
+                found = self._vector_search_many([queries[i] for i in indices], grade, subject, query_lang, top_k)
+                vector_hits.update(zip(indices, found))
+        
+        for i in pending:
+            vector_results = vector_hits.get(i, [])
+            keyword_results = keyword_futures[i].result() if run_keyword else []
+            results[i] = _merge_results(vector_results, keyword_results, top_k)
+            if vectors_ready or not self.use_vectors:
+                self.result_cache.put(cache_keys[i], generation, results[i])
         return results
     
+    def _route_lang(
+        self, query: str, grade: int, subject: str | None, lang: str | None, generation: int
+    ) -> str | None:
+        """
+        Language partition to search for a query
+        
+        The script of the query (Tamil or Latin) wins over the caller's lang;
+        mixed-script queries keep the caller's lang. If no lessons in that
+        language are indexed for the grade ± 1 / subject scope, returns None
+        so both FTS and FAISS search across languages instead.
+        """
+        target = (detect_script(query) if RAG_SCRIPT_ROUTING else None) or lang
+        if not target:
+            return None
+        
+        if self._scopes is None or self._scopes[0] != generation:
+            rows = self._connect().execute(SQL_LESSON_SCOPES).fetchall()
+            self._scopes = (generation, frozenset(rows))
+        for scope_grade, scope_subject, scope_lang in self._scopes[1]:
+            if scope_lang == target and abs(scope_grade - grade) <= 1 and (not subject or scope_subject == subject):
+                return target
+        return None
+    
+    def _resolve_method(self, method: str) -> tuple[str, bool]:
+        """Until the model has warmed up, degrade to keyword-only (callers don't cache that)"""
+        vectors_ready = self.vectors_ready
+        if not vectors_ready and self.use_vectors and method in ["vector", "hybrid"]:
+            method = "keyword"
+        return method, vectors_ready
+    
+    def _vector_search(
+        self, query: str, grade: int, subject: str | None, lang: str | None, top_k: int
+    ) -> list[RAGResult]:
+        """Semantic vector search using FAISS, scanning only eligible partitions"""
+        return self._vector_search_many([query], grade, subject, lang, top_k)[0]
+    
+    def _vector_search_many(
+        self, queries: list[str], grade: int, subject: str | None, lang: str | None, top_k: int
+    ) -> list[list[RAGResult]]:
+        """Vector search for several queries with one FAISS call per eligible partition"""
+        if not self.use_vectors or self.vectors.ntotal == 0:
+            return [[] for _ in queries]
+        
+        query_embeddings = self._embed_queries(queries)
+        
+        # Search only grade ± 1 / subject / lang partitions, so every hit is usable
+        hits_per_query = self.vectors.search_batch(query_embeddings, grade, subject, lang, top_k)
+        use_sections = RAG_SECTION_VECTORS and self.sections.ntotal
+        if use_sections:
+            # Lessons without content have no sections: their lesson vectors compete with the
+            # sections (lesson-level hits of lessons that have content are dropped below)
+            hits_per_query = [
+                self._merge_lesson_hits(section_hits, lesson_hits)
+                for section_hits, lesson_hits in zip(
+                    self._section_search_many(query_embeddings, grade, subject, lang, top_k), hits_per_query
+                )
+            ]
+        
+        # Hydrate all surviving hits with a single query
+        rows = self._fetch_content([doc["lesson_id"] for hits in hits_per_query for doc, _ in hits])
+        
+        all_results = []
+        for hits in hits_per_query:
+            results = []
+            for doc, score in hits:
+                row = rows.get(doc["lesson_id"])
+                if row:
+                    content, summary = row
+                    if use_sections and "span" not in doc and content:
+                        continue  # Represented by its sections
+                    if "span" in doc and content:
+                        # Best-matching passage instead of the whole lesson
+                        content = summary = content[doc["span"][0]:doc["span"][1]]
+                    results.append(RAGResult(
+                        content=content or summary or "",
+                        source=doc["lesson_id"],
+                        grade=doc["grade"],
+                        subject=doc["subject"],
+                        relevance_score=score,
+                        snippet=summary or content[:200] if content else ""
+                    ))
+            all_results.append(results[:top_k])
+        
+        return all_results
+    
+    @staticmethod
+    def _merge_lesson_hits(
+        section_hits: list[tuple[dict[str, Any], float]], lesson_hits: list[tuple[dict[str, Any], float]]
+    ) -> list[tuple[dict[str, Any], float]]:
+        """Section hits plus lesson-level hits of other lessons, best score first"""
+        seen = {doc["lesson_id"] for doc, _ in section_hits}
+        merged = section_hits + [(doc, score) for doc, score in lesson_hits if doc["lesson_id"] not in seen]
+        return sorted(merged, key=lambda hit: hit[1], reverse=True)
+    
+    def _section_search_many(
+        self, query_embeddings, grade: int, subject: str | None, lang: str | None, top_k: int
+    ) -> list[list[tuple[dict[str, Any], float]]]:
+        """
+        Lesson hits from the section store, each lesson scored by its best section (max-sim)
+        
+        Returns:
+            Per query, up to top_k (doc, score) pairs; doc["span"] is the best section
+        """
+        all_hits = []
+        for hits in self.sections.search_batch(query_embeddings, grade, subject, lang, top_k * RAG_SECTION_OVERSAMPLE):
+            best: dict[str, tuple[dict[str, Any], float]] = {}
+            for doc, score in hits:  # Sorted by score, so a lesson's first section is its best
+                lesson_id, span = _split_section_key(doc["lesson_id"])
+                if lesson_id not in best:
+                    best[lesson_id] = ({**doc, "lesson_id": lesson_id, "span": span}, score)
+            all_hits.append(list(best.values())[:top_k])
+        return all_hits
+    
+    def _embed_query(self, query: str):
+        """Query embedding, served from the LRU cache when the question was seen before"""
+        return self._embed_queries([query])[0]
+    
+    def _embed_queries(self, queries: list[str]) -> list:
+        """Query embeddings; questions not in the cache are encoded in one batch"""
+        embeddings = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.embedder.encode([queries[i] for i in missing], normalize_embeddings=True)
+            for i, embedding in zip(missing, encoded):
+                self.query_cache.put(queries[i], embedding)
+                embeddings[i] = embedding
+        return embeddings
+    
+    def _fetch_content(self, lesson_ids: list[str]) -> dict[str, tuple[str, str]]:
+        """Fetch (content, summary) for many lessons with batched IN (...) queries"""
+        rows: dict[str, tuple[str, str]] = {}
+        conn = self._connect()
+        for batch in _batched(list(dict.fromkeys(lesson_ids)), SQLITE_MAX_VARIABLES):
+            placeholders = ",".join("?" * len(batch))
+            cursor = conn.execute(
+                f"SELECT lesson_id, content, summary FROM lessons_meta WHERE lesson_id IN ({placeholders})",
+                batch
+            )
+            rows.update((row[0], (row[1], row[2])) for row in cursor.fetchall())
+        return rows
+    
     def _keyword_search(
         self, query: str, grade: int, subject: str | None, lang: str | None, top_k: int
     ) -> list[RAGResult]:
         """Full-text keyword search using SQLite FTS5"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        # Build FTS query
-        fts_query = f'"{query}"'
+        # Whole question as one FTS phrase (embedded quotes doubled)
+        fts_query = '"' + query.replace('"', '""') + '"'
         
-        # Build SQL filters
-        filters = [f"grade BETWEEN {max(0, grade - 1)} AND {min(7, grade + 1)}"]
+        # Metadata filters run on lessons_meta through its indexes, all values bound
+        params: list[Any] = [fts_query, max(0, grade - 1), min(7, grade + 1)]
+        filters = ""
         if subject:
-            filters.append(f"subject = '{subject}'")
+            filters += " AND m.subject = ?"
+            params.append(subject)
         if lang:
-            filters.append(f"lang = '{lang}'")
-        
-        where_clause = " AND ".join(filters)
+            filters += " AND m.lang = ?"
+            params.append(lang)
+        params.append(top_k)
         
-        # Execute FTS search
-        cursor.execute(f"""
-            SELECT 
-                lesson_id, grade, subject, title, content, summary,
-                rank
-            FROM lessons_fts
-            WHERE lessons_fts MATCH ? AND {where_clause}
-            ORDER BY rank
-            LIMIT ?
-        """, (fts_query, top_k))
+        cursor = self._connect().execute(SQL_KEYWORD_SEARCH.format(filters=filters), params)
         
         results = []
         for row in cursor.fetchall():
@@ -407,22 +1404,93 @@ class RAGEngine:
                 snippet=summary or (content[:200] if content else "")
             ))
         
-        conn.close()
         return results
     
-    def get_lesson_by_id(self, lesson_id: str) -> dict[str, Any] | None:
-        """Retrieve a specific lesson by ID"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+    def compress_results(self, query: str, results: list[RAGResult], token_budget: int) -> list[RAGResult]:
+        """
+        Shrink retrieved content to the sentences that best answer the query
         
-        cursor.execute("""
-            SELECT lesson_id, grade, subject, title, lang, content, summary, keywords, difficulty
-            FROM lessons_meta
-            WHERE lesson_id = ?
-        """, (lesson_id,))
+        Args:
+            query: User's question
+            results: Hits from retrieve()
+            token_budget: Estimated LLM tokens allowed for all hits together
         
-        row = cursor.fetchone()
-        conn.close()
+        Returns:
+            Copies of the results whose content holds only the selected
+            sentences (results left without any text are dropped)
+        """
+        if not results:
+            return results
+        
+        scored_hits = self._score_sentences(query, results)
+        texts = pack_sentences(scored_hits, token_budget)
+        return [
+            replace(result, content=text)
+            for result, text in zip(results, texts)
+            if text
+        ]
+    
+    def _score_sentences(self, query: str, results: list[RAGResult]) -> list[list[tuple[str, float]]]:
+        """Per result, its sentences with a relevance score for the query"""
+        use_embeddings = self.vectors_ready and (
+            RAG_CONTEXT_SCORER == "embedding"
+            or (RAG_CONTEXT_SCORER == "auto" and self.embedding_store is not None)
+        )
+        if not use_embeddings:
+            return self._score_sentences_fts(query, results)
+        
+        sentence_lists = [split_sentences(result.content) for result in results]
+        flat = [sentence for sentences in sentence_lists for sentence in sentences]
+        if not flat:
+            return [[] for _ in results]
+        
+        query_embedding = self._embed_query(query)
+        # Sentences of popular lessons repeat across calls: only new ones are encoded
+        embeddings, _ = self._embed_documents(flat)
+        similarities = (embeddings @ query_embedding).tolist()
+        
+        scored_hits = []
+        offset = 0
+        for sentences in sentence_lists:
+            scored_hits.append(list(zip(sentences, similarities[offset:offset + len(sentences)])))
+            offset += len(sentences)
+        return scored_hits
+    
+    def _score_sentences_fts(self, query: str, results: list[RAGResult]) -> list[list[tuple[str, float]]]:
+        """Score sentences by how many query terms FTS5 highlight() marks in them"""
+        terms = list(dict.fromkeys(t for t in normalize_query(query).split() if len(t) > 1))
+        highlighted: dict[str, str] = {}
+        if terms:
+            fts_query = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms[:MAX_HIGHLIGHT_TERMS])
+            lesson_ids = list(dict.fromkeys(result.source for result in results))
+            placeholders = ",".join("?" * len(lesson_ids))
+            cursor = self._connect().execute(
+                SQL_HIGHLIGHT_CONTENT.format(placeholders=placeholders), [fts_query, *lesson_ids]
+            )
+            highlighted = dict(cursor.fetchall())
+        
+        scored_hits = []
+        for result in results:
+            marked = highlighted.get(result.source)
+            if marked:
+                # Section hits carry one passage: score only its sentences
+                marked = _marked_span(marked, result.content)
+            if not marked:
+                # Content came from the summary or nothing matched: keep document order
+                scored_hits.append([(sentence, 0.0) for sentence in split_sentences(result.content)])
+                continue
+            scored_hits.append([
+                (
+                    sentence.replace(HIGHLIGHT_START, "").replace(HIGHLIGHT_END, ""),
+                    float(sentence.count(HIGHLIGHT_START)),
+                )
+                for sentence in split_sentences(marked)
+            ])
+        return scored_hits
+    
+    def get_lesson_by_id(self, lesson_id: str) -> dict[str, Any] | None:
+        """Retrieve a specific lesson by ID"""
+        row = self._connect().execute(SQL_LESSON_BY_ID, (lesson_id,)).fetchone()
         
         if row:
             return {
@@ -440,13 +1508,34 @@ class RAGEngine:
         return None
 
 
-# Singleton instance
+# Singleton instance (a RemoteRAGEngine when RAG_SERVICE_ADDRESS is set)
 _rag_engine: RAGEngine | None = None
+_rag_engine_lock = threading.Lock()
 
 
-def get_rag_engine(use_vectors: bool = True) -> RAGEngine:
-    """Get or create RAG engine singleton"""
+def get_rag_engine(use_vectors: bool = True, background: bool = False) -> RAGEngine:
+    """
+    Get or create RAG engine singleton
+    
+    With RAG_SERVICE_ADDRESS set, returns a client of the shared RAG service
+    instead, so uvicorn workers do not each load the model and indexes.
+    
+    Args:
+        use_vectors: Enable FAISS vector search
+        background: Warm the embedding model in a background thread instead of blocking
+    """
     global _rag_engine
     if _rag_engine is None:
-        _rag_engine = RAGEngine(use_vectors=use_vectors)
+        with _rag_engine_lock:
+            if _rag_engine is None:
+                if RAG_SERVICE_ADDRESS:
+                    from .rag_service import RemoteRAGEngine
+                    _rag_engine = RemoteRAGEngine(RAG_SERVICE_ADDRESS)
+                else:
+                    _rag_engine = RAGEngine(use_vectors=use_vectors, background=background)
     return _rag_engine
+
+
+def start_rag_warmup() -> RAGEngine:
+    """Create the RAG engine at startup and load the model in the background (no-op with the RAG service)"""
+    return get_rag_engine(use_vectors=True, background=True)
@@ -0,0 +1,256 @@
+"""
+Shared RAG service for multi-worker deployments
+
+With `uvicorn app.main:app --workers 4` every worker would load its own copy
+of the embedding model and vector indexes. Instead, one process runs the
+RAGEngine (indexes memory-mapped, see RAG_INDEX_MMAP) and the HTTP workers
+forward retrieval calls to it over a local socket: a Unix socket, or a named
+pipe on Windows, via multiprocessing.connection.
+
+    python -m app.services.rag_service --address data/rag.sock
+    RAG_SERVICE_ADDRESS=data/rag.sock uvicorn app.main:app --workers 4
+
+get_rag_engine() returns a RemoteRAGEngine when RAG_SERVICE_ADDRESS is set.
+
+Requests are pickled, so only holders of the shared key may connect: the
+socket is owner-only, and the handshake uses RAG_SERVICE_AUTHKEY or a random
+key the service writes to data/rag_service.key (mode 0600) on first start.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import secrets
+import stat
+import threading
+from multiprocessing.connection import AuthenticationError, Client, Listener
+from pathlib import Path
+from typing import Any
+
+from .rag_engine import DATA_DIR, RAG_SERVICE_ADDRESS, RAGEngine, RAGResult
+
+
+# Shared secret for the connection handshake; without it the key file is used
+RAG_SERVICE_AUTHKEY = os.getenv("RAG_SERVICE_AUTHKEY", "")
+RAG_SERVICE_KEY_PATH = Path(os.getenv("RAG_SERVICE_KEY_PATH", str(DATA_DIR / "rag_service.key")))
+RAG_SERVICE_TIMEOUT = float(os.getenv("RAG_SERVICE_TIMEOUT", "30"))  # Seconds a worker waits for a reply
+RAG_SERVICE_IDLE_CONNECTIONS = int(os.getenv("RAG_SERVICE_IDLE_CONNECTIONS", "8"))  # Kept open per worker
+
+# RAGEngine methods workers may call (read-only; indexing stays with the CLI tools)
+SERVICE_METHODS = frozenset({
+    "retrieve", "retrieve_many", "compress_results", "related", "get_lesson_by_id",
+    "status", "wait_until_ready",
+})
+
+
+def default_address() -> str:
+    """Unix socket next to knowledge.db, or a named pipe on Windows"""
+    if os.name == "nt":
+        return r"\\.\pipe\edu-mentor-rag"
+    return str(DATA_DIR / "rag.sock")
+
+
+def service_authkey(create: bool = False) -> bytes:
+    """
+    Shared secret for the connection handshake
+
+    RAG_SERVICE_AUTHKEY when set, else the contents of RAG_SERVICE_KEY_PATH.
+
+    Args:
+        create: Write a random key file if there is none (the service does, at startup)
+
+    Raises:
+        RuntimeError: No key is configured, or the key file is readable by other users
+    """
+    if RAG_SERVICE_AUTHKEY:
+        return RAG_SERVICE_AUTHKEY.encode("utf-8")
+
+    path = RAG_SERVICE_KEY_PATH
+    if create and not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # Another service process created it first
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            print(f"🔑 Created RAG service key {path}")
+
+    try:
+        if os.name != "nt" and stat.S_IMODE(path.stat().st_mode) & 0o077:
+            raise RuntimeError(f"RAG service key {path} is readable by other users; run chmod 600 on it")
+        key = path.read_text().strip()
+    except FileNotFoundError:
+        key = ""
+    if not key:
+        raise RuntimeError(
+            f"No RAG service key: set RAG_SERVICE_AUTHKEY, or start the RAG service first (it creates {path})"
+        )
+    return key.encode("utf-8")
+
+
+def _handle(engine: RAGEngine, conn):
+    """Serve one worker connection until it is closed"""
+    with conn:
+        while True:
+            try:
+                method, args, kwargs = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if method not in SERVICE_METHODS:
+                    raise AttributeError(f"{method} is not available over the RAG service")
+                reply = (True, getattr(engine, method)(*args, **kwargs))
+            except Exception as e:
+                reply = (False, f"{type(e).__name__}: {e}")
+            try:
+                conn.send(reply)
+            except (EOFError, OSError):
+                return
+
+
+def serve(address: str, engine: RAGEngine | None = None):
+    """
+    Run the RAG service, one thread per worker connection, until interrupted
+
+    Args:
+        address: Unix socket path or Windows named pipe
+        engine: Engine to serve (default: a new one, warmed in the background)
+    """
+    authkey = service_authkey(create=True)  # Before loading anything: refuse to start without a key
+    engine = engine or RAGEngine(use_vectors=True, background=True)
+
+    if os.name != "nt":
+        Path(address).parent.mkdir(parents=True, exist_ok=True)
+        Path(address).unlink(missing_ok=True)  # Left behind by a previous run
+
+    # Bind under an owner-only umask so the socket is never reachable by other users
+    old_umask = os.umask(0o077)
+    try:
+        listener = Listener(address, authkey=authkey)
+    finally:
+        os.umask(old_umask)
+
+    with listener:
+        print(f"🛰️ RAG service listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError) as e:
+                print(f"⚠️ Rejected RAG service connection: {e}")
+                continue
+            threading.Thread(target=_handle, args=(engine, conn), name="rag-service", daemon=True).start()
+
+
+class RemoteRAGEngine:
+    """RAGEngine stand-in for HTTP workers that forwards calls to the RAG service"""
+
+    def __init__(self, address: str):
+        self.address = address
+        self._idle: list[Any] = []
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, *args, **kwargs):
+        return self._request(method, args, kwargs, RAG_SERVICE_TIMEOUT)
+
+    def _request(self, method: str, args: tuple, kwargs: dict[str, Any], timeout: float | None):
+        """
+        Send one call and wait up to `timeout` seconds for its reply
+
+        Raises:
+            TimeoutError: The service did not reply in time
+        """
+        # A pooled connection may be stale (service restarted): retry once on a new one
+        for attempt in range(2):
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = Client(self.address, authkey=service_authkey())
+            try:
+                conn.send((method, args, kwargs))
+                replied = conn.poll(timeout)
+                if replied:
+                    ok, value = conn.recv()
+            except (EOFError, OSError):
+                conn.close()
+                if attempt:
+                    raise
+                continue
+            if not replied:
+                # The late reply would arrive on this connection, so it cannot be reused
+                conn.close()
+                raise TimeoutError(f"RAG service did not answer {method} within {timeout:.0f}s")
+            with self._lock:
+                if len(self._idle) < RAG_SERVICE_IDLE_CONNECTIONS:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+            if not ok:
+                raise RuntimeError(f"RAG service error: {value}")
+            return value
+
+    def retrieve(self, *args, **kwargs) -> list[RAGResult]:
+        """See RAGEngine.retrieve"""
+        return self._call("retrieve", *args, **kwargs)
+
+    async def retrieve_async(self, *args, **kwargs) -> list[RAGResult]:
+        """See RAGEngine.retrieve_async (the socket round trip runs off the event loop)"""
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: self.retrieve(*args, **kwargs))
+
+    def retrieve_many(self, *args, **kwargs) -> list[list[RAGResult]]:
+        """See RAGEngine.retrieve_many"""
+        return self._call("retrieve_many", *args, **kwargs)
+
+    def compress_results(self, *args, **kwargs) -> list[RAGResult]:
+        """See RAGEngine.compress_results"""
+        return self._call("compress_results", *args, **kwargs)
+
+    def related(self, *args, **kwargs) -> list[dict[str, Any]]:
+        """See RAGEngine.related"""
+        return self._call("related", *args, **kwargs)
+
+    def get_lesson_by_id(self, lesson_id: str) -> dict[str, Any] | None:
+        """See RAGEngine.get_lesson_by_id"""
+        return self._call("get_lesson_by_id", lesson_id)
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        reply_timeout = None if timeout is None else timeout + RAG_SERVICE_TIMEOUT
+        return self._request("wait_until_ready", (timeout,), {}, reply_timeout)
+
+    @property
+    def vectors_ready(self) -> bool:
+        return self.status().get("vectors_ready", False)
+
+    def status(self) -> dict[str, Any]:
+        """Service status for health checks; reports the service as down instead of raising"""
+        try:
+            return {**self._call("status"), "service": self.address}
+        except (OSError, EOFError, RuntimeError, AuthenticationError) as e:
+            return {"vectors_ready": False, "mode": "unavailable", "service": self.address, "error": str(e)}
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the shared RAG retrieval service for uvicorn workers")
+    parser.add_argument("--address", default=RAG_SERVICE_ADDRESS or default_address(),
+                        help="Unix socket path or Windows named pipe (workers need the same RAG_SERVICE_ADDRESS)")
+    args = parser.parse_args()
+
+    try:
+        serve(args.address)
+    except KeyboardInterrupt:
+        print("👋 RAG service stopped")
+
+
+if __name__ == "__main__":
+    main()
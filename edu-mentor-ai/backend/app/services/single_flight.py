@@ -0,0 +1,125 @@
+"""
+Single-flight coalescing of identical concurrent calls
+
+When a class presses Explain on the same lesson at once, every request builds
+the same prompt. Instead of queueing N identical generations in Ollama, the
+first call (the leader) runs it and the others await the same result, or
+subscribe to the same token stream.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Broadcast:
+    """Fans one async iterator out to any number of subscribers"""
+
+    def __init__(self, source: AsyncIterator[Any]):
+        self.items: list[Any] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]):
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._wake()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self.done = True
+            self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        """All items from the start (late subscribers replay what was already produced)"""
+        self.subscribers += 1
+        try:
+            i = 0
+            while True:
+                while i < len(self.items):
+                    yield self.items[i]
+                    i += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers and not self.done:
+                self.task.cancel()  # Nobody is listening any more: stop the upstream work
+
+
+class SingleFlight:
+    """In-flight calls by key; concurrent calls with the same key share one execution"""
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self._streams: dict[Hashable, _Broadcast] = {}
+        self.leaders = 0
+        self.merged = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Result of factory(), shared with concurrent calls for the same key
+
+        The shared call runs as its own task, so a caller that is cancelled
+        (client disconnected) does not cancel it for the others.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.merged += 1
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Items of factory(), shared with concurrent streams for the same key
+
+        The shared stream is cancelled once its last subscriber leaves.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None or broadcast.done:
+            self.leaders += 1
+            broadcast = _Broadcast(factory())
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(
+                lambda _: self._streams.pop(key, None) if self._streams.get(key) is broadcast else None
+            )
+        else:
+            self.merged += 1
+        async with aclosing(broadcast.subscribe()) as items:
+            async for item in items:
+                yield item
+
+    def stats(self) -> dict[str, Any]:
+        """Coalescing counters since startup"""
+        calls = self.leaders + self.merged
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "upstream_calls": self.leaders,
+            "merged_calls": self.merged,
+            "merge_ratio": round(self.merged / calls, 3) if calls else 0.0,
+        }
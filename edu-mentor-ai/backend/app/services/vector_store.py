@@ -0,0 +1,664 @@
+"""
+Partitioned FAISS vector store for the RAG engine
+
+Vectors are split into one small index per (grade, subject, lang) partition so
+a query only scans the partitions it is allowed to see (grade ± 1, subject,
+language) instead of over-fetching from one global index and filtering in Python.
+
+Each partition is an ID-mapped index (vector id = stable hash of lesson_id), so
+documents can be replaced or removed in place without rebuilding.
+
+Index types (RAG_INDEX_TYPE) trade accuracy for RAM on 2-4 GB devices:
+    flat   exact float32 (1536 bytes/vector)
+    fp16   float16 scalar quantizer (768 bytes/vector)
+    sq8    8-bit scalar quantizer (384 bytes/vector)
+    pq     4-bit product quantizer (dim/16 bytes/vector)
+    ivf    inverted lists over sq8 codes, scans a few clusters per query
+    hnsw   graph index, fastest queries but uses the most RAM
+    binary two-stage: partitions hold only 1 bit/dimension codes (48
+           bytes/vector) of randomly rotated vectors, so Hamming distance
+           approximates the angle (SimHash) for dense and sparse embeddings
+           alike. A Hamming scan picks top_k * rerank_factor candidates in
+           total, shared among the eligible partitions by size, which are
+           re-scored exactly against float16 vectors in a separate
+           memory-mapped store (768 bytes/vector on disk, paged in only for
+           candidates). Measure recall against flat with
+           tools/rag_benchmark.py before deploying
+
+Optionally (reduce_dim) vectors are projected to fewer dimensions before they
+reach any partition, e.g. 384 -> 128 with fp16 storage is 256 bytes/vector.
+The projection is the top right-singular vectors of the stored embeddings,
+trained once enough vectors are indexed. It is not mean-centered, so inner
+products (cosine scores) are preserved within the kept subspace.
+
+On-disk layout:
+    data/vectors/<grade>_<subject>_<lang>.faiss   one index per partition
+    data/vectors/<grade>_<subject>_<lang>.ids.npy,
+                 <grade>_<subject>_<lang>.f16.npy binary only: sorted vector ids and their
+                                                  float16 vectors for the exact re-scoring
+    data/vectors/docmap.npz                       binary doc_map (vector id -> lesson_id)
+                                                  and the projection and binary rotation
+                                                  matrices, if any
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import re
+from pathlib import Path
+from typing import Any
+
+try:
+    import faiss
+    import numpy as np
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+    faiss = None
+    np = None
+
+
+DOC_MAP_VERSION = 5
+READABLE_DOC_MAP_VERSIONS = (3, 4, 5)  # 4 added the optional projection matrix, 5 the rotation
+
+INDEX_TYPES = ("flat", "fp16", "sq8", "pq", "ivf", "hnsw", "binary")
+
+# Types that must be trained; partitions stay flat until they hold enough vectors
+MIN_TRAIN_VECTORS = {"sq8": 64, "pq": 16 * 39, "ivf": 4 * 39, "binary": 64}
+
+IVF_NPROBE = 4
+HNSW_M = 32
+BINARY_RERANK_FACTOR = 16  # Default candidates re-scored per requested result, across all partitions
+BINARY_ROTATION_SEED = 1234
+
+PROJECTION_MIN_VECTORS = 1000  # Vectors indexed before a reduce_dim projection is trained
+PROJECTION_SAMPLE = 20_000  # Vectors the projection is fitted on
+
+
+def partition_key(grade: int, subject: str, lang: str) -> str:
+    """Partition key used in the doc_map sidecar"""
+    return f"{grade}/{subject}/{lang}"
+
+
+def _split_key(key: str) -> tuple[int, str, str]:
+    grade, subject, lang = key.split("/", 2)
+    return int(grade), subject, lang
+
+
+def _partition_filename(key: str) -> str:
+    grade, subject, lang = _split_key(key)
+    safe = re.sub(r"[^\w-]", "_", f"{grade}_{subject}_{lang}")
+    return f"{safe}.faiss"
+
+
+def vector_id(lesson_id: str) -> int:
+    """Stable non-negative int64 FAISS id for a lesson"""
+    digest = hashlib.blake2b(lesson_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def _atomic_write_bytes(path: Path, write):
+    """Write via a temp file + os.replace so readers never see a partial file"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _rerank_filenames(key: str) -> tuple[str, str]:
+    stem = _partition_filename(key).removesuffix(".faiss")
+    return f"{stem}.ids.npy", f"{stem}.f16.npy"
+
+
+def _save_npy(path: Path, array):
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+def _mmap_flags() -> int:
+    """read_index flags that let the OS page index data instead of copying it into RAM"""
+    # faiss >= 1.11 maps flat / quantized codes too; older versions only map IVF lists
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+class PartitionedVectorStore:
+    """FAISS indexes partitioned by (grade, subject, lang)"""
+
+    def __init__(
+        self,
+        index_dir: Path,
+        map_path: Path,
+        dim: int = 384,
+        index_type: str = "flat",
+        mmap: bool = False,
+        rerank_factor: int = BINARY_RERANK_FACTOR,
+        reduce_dim: int = 0,
+    ):
+        """
+        Args:
+            index_dir: Directory holding one .faiss file per partition
+            map_path: Binary doc_map sidecar (.npz)
+            dim: Embedding dimensions (384 for MiniLM)
+            index_type: One of INDEX_TYPES, used for new or rebuilt partitions
+            mmap: Memory-map partitions on load (read-only until modified)
+            rerank_factor: Binary index candidates re-scored exactly per result
+            reduce_dim: Project vectors to this many dimensions (0 keeps dim); only
+                used when no projection exists yet, change it with reset()
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+        self.index_dir = index_dir
+        self.map_path = map_path
+        self.dim = dim
+        self.index_type = index_type
+        self.rerank_factor = max(1, rerank_factor)
+        self.reduce_dim = reduce_dim if 0 < reduce_dim < dim else 0
+        self.projection = None  # (dim, reduced dim) matrix once trained
+        self.rotation = None  # (index_dim, index_dim) orthogonal matrix applied before binarizing
+        self.mmap = mmap
+        self.partitions: dict[str, Any] = {}
+        self.rerank: dict[str, tuple[Any, Any]] = {}  # binary partition -> (sorted ids, float16 vectors)
+        self.doc_maps: dict[str, dict[int, str]] = {}  # partition -> vector id -> lesson_id
+        self.locations: dict[str, str] = {}  # lesson_id -> partition key
+        self._dirty: set[str] = set()
+        self._mapped: set[str] = set()
+
+    @property
+    def ntotal(self) -> int:
+        return sum(index.ntotal for index in self.partitions.values())
+
+    @property
+    def index_dim(self) -> int:
+        """Dimensions stored in the partitions"""
+        return self.projection.shape[1] if self.projection is not None else self.dim
+
+    @property
+    def staging_partitions(self) -> int:
+        """Partitions still held flat because they are below MIN_TRAIN_VECTORS"""
+        return sum(self._is_staging(index) for index in self.partitions.values())
+
+    def _project(self, vectors):
+        if self.projection is None:
+            return vectors
+        return np.ascontiguousarray(vectors @ self.projection, dtype=np.float32)
+
+    def _build_index(self, count: int):
+        """Empty index of the configured type, sized for `count` vectors"""
+        dim = self.index_dim
+        if self.index_type == "flat" or count < MIN_TRAIN_VECTORS.get(self.index_type, 0):
+            # Inner Product for cosine similarity; also the staging index for trained types
+            base = faiss.IndexFlatIP(dim)
+        elif self.index_type == "fp16":
+            base = faiss.index_factory(dim, "SQfp16", faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "sq8":
+            base = faiss.index_factory(dim, "SQ8", faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "pq":
+            base = faiss.index_factory(dim, f"PQ{dim // 8}x4", faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "ivf":
+            nlist = max(1, min(int(math.sqrt(count)), count // 39))
+            base = faiss.index_factory(dim, f"IVF{nlist},SQ8", faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "binary":
+            # Sign bits of rotated vectors (see _rotate) against trained per-dimension
+            # thresholds; the float vectors live in self.rerank
+            base = faiss.IndexLSH(dim, dim, False, True)
+        else:
+            base = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        # Wrapped so vectors carry lesson ids
+        return self._tune(faiss.IndexIDMap2(base))
+
+    def _tune(self, index):
+        """Apply search-time parameters that are not stored in the index file"""
+        base = faiss.downcast_index(index.index)
+        if isinstance(base, faiss.IndexIVF):
+            base.nprobe = IVF_NPROBE
+        return index
+
+    @staticmethod
+    def _is_binary(index) -> bool:
+        return isinstance(faiss.downcast_index(index.index), faiss.IndexLSH)
+
+    def _rotate(self, vectors):
+        """Vectors in the space binary codes are computed in (one rotation shared by all partitions)"""
+        dim = vectors.shape[1]
+        if self.rotation is None or self.rotation.shape[0] != dim:
+            rng = np.random.default_rng(BINARY_ROTATION_SEED)
+            q, r = np.linalg.qr(rng.standard_normal((dim, dim)))
+            self.rotation = np.ascontiguousarray(q * np.sign(np.diag(r)), dtype=np.float32)
+        return np.ascontiguousarray(vectors @ self.rotation, dtype=np.float32)
+
+    def _filled_index(self, key: str, ids, vectors):
+        """New index of the configured type holding `vectors`; sets the partition's re-scoring store"""
+        index = self._build_index(len(ids))
+        binary = self._is_binary(index)
+        if len(ids):
+            codes_input = self._rotate(vectors) if binary else vectors
+            if not index.is_trained:
+                index.train(codes_input)
+            index.add_with_ids(codes_input, ids)
+        if binary:
+            self._set_rerank(key, ids, vectors)
+        else:
+            self.rerank.pop(key, None)
+        return index
+
+    def _stored_vectors(self, key: str):
+        """(ids, float32 vectors) of a partition, in index order"""
+        index = self.partitions[key]
+        ids = faiss.vector_to_array(index.id_map)
+        if key in self.rerank:
+            # Binary codes cannot be decoded: read the re-scoring store instead
+            sorted_ids, vectors = self.rerank[key]
+            return ids, np.asarray(vectors[np.searchsorted(sorted_ids, ids)], dtype=np.float32)
+        base = faiss.downcast_index(index.index)
+        if isinstance(base, faiss.IndexIVF):
+            # IVF lists can only be decoded by position through a direct map
+            base.make_direct_map()
+        return ids, base.reconstruct_n(0, index.ntotal)
+
+    def _set_rerank(self, key: str, ids, vectors):
+        """Replace a partition's re-scoring store (ids and vectors in any order)"""
+        order = np.argsort(ids)
+        self.rerank[key] = (ids[order], np.asarray(vectors, dtype=np.float16)[order])
+
+    def _add_rerank(self, key: str, ids, vectors):
+        if key in self.rerank:
+            old_ids, old_vectors = self.rerank[key]
+            ids = np.concatenate([old_ids, ids])
+            vectors = np.concatenate([np.asarray(old_vectors), np.asarray(vectors, dtype=np.float16)])
+        self._set_rerank(key, ids, vectors)
+
+    def _drop_rerank(self, key: str, drop_ids):
+        if key in self.rerank:
+            ids, vectors = self.rerank[key]
+            keep = ~np.isin(ids, drop_ids)
+            self.rerank[key] = (ids[keep], np.asarray(vectors[keep]))
+
+    @staticmethod
+    def _removes_in_place(index) -> bool:
+        """True when remove_ids keeps the IDMap2 id order in step with the stored codes"""
+        return isinstance(faiss.downcast_index(index.index), faiss.IndexFlatCodes)
+
+    def _is_staging(self, index) -> bool:
+        """True for a flat partition that should become a trained index"""
+        if self.index_type in ("flat", "fp16", "hnsw"):
+            return False
+        return isinstance(faiss.downcast_index(index.index), faiss.IndexFlat)
+
+    def _rebuild(self, key: str, drop_ids=None):
+        """Re-create a partition with the configured type from its stored vectors"""
+        ids, vectors = self._stored_vectors(key)
+        if drop_ids is not None:
+            keep = ~np.isin(ids, drop_ids)
+            ids, vectors = ids[keep], vectors[keep]
+
+        self.partitions[key] = self._filled_index(key, ids, vectors)
+
+    def _train_projection(self):
+        """Fit the reduce_dim projection and re-create every partition in the reduced space"""
+        rng = np.random.default_rng(0)
+        fraction = min(1.0, PROJECTION_SAMPLE / max(1, self.ntotal))
+        sample = []
+        for key, index in self.partitions.items():
+            if index.ntotal == 0:
+                continue
+            _, vectors = self._stored_vectors(key)
+            take = max(1, round(len(vectors) * fraction))
+            sample.append(vectors[rng.choice(len(vectors), size=take, replace=False)])
+
+        # Top eigenvectors of the uncentered second moment X^T X (= right-singular
+        # vectors of X): the directions that carry the most inner product
+        sample = np.vstack(sample).astype(np.float64)
+        _, eigenvectors = np.linalg.eigh(sample.T @ sample)
+        self.projection = np.ascontiguousarray(eigenvectors[:, ::-1][:, :self.reduce_dim], dtype=np.float32)
+
+        # Existing partitions still hold full vectors; new ones get index_dim
+        for key in list(self.partitions):
+            ids, vectors = self._stored_vectors(key)
+            self.partitions[key] = self._filled_index(key, ids, self._project(vectors))
+            self._mapped.discard(key)
+            self._dirty.add(key)
+        print(f"📉 Projected vectors from {self.dim} to {self.reduce_dim} dimensions")
+
+    def _writable(self, key: str):
+        """Swap a memory-mapped (read-only) partition for an in-RAM copy before modifying it"""
+        if key in self._mapped:
+            index_path = self.index_dir / _partition_filename(key)
+            self.partitions[key] = self._tune(faiss.read_index(str(index_path)))
+            self._mapped.discard(key)
+        return self.partitions[key]
+
+    def reset(self):
+        """Drop all partitions, the projection and the rotation (in memory only until save())"""
+        self._dirty.update(self.partitions)
+        self.partitions = {}
+        self.rerank = {}
+        self.doc_maps = {}
+        self.locations = {}
+        self._mapped = set()
+        self.projection = None
+        self.rotation = None
+
+    def load(self, legacy_map_path: Path | None = None) -> bool:
+        """
+        Load partitions from disk
+
+        Args:
+            legacy_map_path: JSON doc_map written by older versions, read if no binary map exists
+
+        Returns:
+            True if a partitioned index was found
+        """
+        projection = rotation = None
+        if self.map_path.exists():
+            self.dim, doc_maps, projection, rotation = self._read_doc_map()
+        elif legacy_map_path is not None and legacy_map_path.exists():
+            data = json.loads(legacy_map_path.read_text(encoding="utf-8"))
+            if not isinstance(data, dict) or data.get("version") != 2:
+                return False
+            self.dim = data.get("dim", self.dim)
+            doc_maps = {
+                key: {int(vid): doc["lesson_id"] for vid, doc in docs.items()}
+                for key, docs in data.get("partitions", {}).items()
+            }
+        else:
+            return False
+
+        self.reset()
+        self._dirty.clear()
+        self.projection = projection
+        self.rotation = rotation
+        flags = _mmap_flags() if self.mmap else 0
+        for key, docs in doc_maps.items():
+            index_path = self.index_dir / _partition_filename(key)
+            if not index_path.exists():
+                print(f"⚠️ Missing vector partition {index_path.name}, skipping")
+                continue
+            self.partitions[key] = self._tune(faiss.read_index(str(index_path), flags))
+            if self._is_binary(self.partitions[key]):
+                ids_name, vectors_name = _rerank_filenames(key)
+                mmap_mode = "r" if self.mmap else None
+                self.rerank[key] = (
+                    np.load(self.index_dir / ids_name, mmap_mode=mmap_mode),
+                    np.load(self.index_dir / vectors_name, mmap_mode=mmap_mode),
+                )
+            if self.mmap:
+                self._mapped.add(key)
+            self.doc_maps[key] = docs
+            for lesson_id in docs.values():
+                self.locations[lesson_id] = key
+
+        if not self.map_path.exists():
+            self.save()  # Convert a legacy JSON doc_map to the binary format
+        return True
+
+    def migrate_flat_index(self, legacy_index_path: Path, legacy_map_path: Path) -> bool:
+        """
+        Split a legacy single IndexFlatIP + list doc_map into partitions
+
+        Returns:
+            True if a legacy index was migrated
+        """
+        if not legacy_index_path.exists() or not legacy_map_path.exists():
+            return False
+
+        doc_map = json.loads(legacy_map_path.read_text(encoding="utf-8"))
+        if not isinstance(doc_map, list):
+            return False
+
+        print(f"🔀 Migrating {legacy_index_path.name} to partitioned vector store")
+        legacy = faiss.read_index(str(legacy_index_path))
+        count = min(legacy.ntotal, len(doc_map))
+        self.dim = legacy.d
+        self.reset()
+        if count:
+            self.upsert(doc_map[:count], legacy.reconstruct_n(0, count))
+        self.save()
+        return True
+
+    def upsert(self, docs: list[dict[str, Any]], embeddings):
+        """
+        Insert or replace normalized embeddings, routing each document to its partition
+
+        Args:
+            docs: Documents with lesson_id, grade, subject and lang
+            embeddings: Array of shape (len(docs), dim)
+        """
+        vectors = self._project(np.asarray(embeddings, dtype=np.float32))
+
+        # Last occurrence of a lesson_id wins (legacy doc_maps may hold duplicates)
+        latest = {doc["lesson_id"]: row for row, doc in enumerate(docs)}
+        self.remove(list(latest))
+
+        grouped: dict[str, list[int]] = {}
+        for row in latest.values():
+            doc = docs[row]
+            key = partition_key(doc["grade"], doc["subject"], doc["lang"])
+            grouped.setdefault(key, []).append(row)
+
+        for key, rows in grouped.items():
+            if key not in self.partitions:
+                self.partitions[key] = self._build_index(0)
+                self.doc_maps[key] = {}
+            index = self._writable(key)
+            ids = np.array([vector_id(docs[row]["lesson_id"]) for row in rows], dtype=np.int64)
+            if self._is_binary(index):
+                index.add_with_ids(self._rotate(vectors[rows]), ids)
+                self._add_rerank(key, ids, vectors[rows])
+            else:
+                index.add_with_ids(vectors[rows], ids)
+            for vid, row in zip(ids.tolist(), rows):
+                self.doc_maps[key][vid] = docs[row]["lesson_id"]
+                self.locations[docs[row]["lesson_id"]] = key
+            self._dirty.add(key)
+
+    def remove(self, lesson_ids: list[str]) -> int:
+        """
+        Remove documents from whichever partitions hold them
+
+        Returns:
+            Number of vectors removed
+        """
+        grouped: dict[str, list[int]] = {}
+        for lesson_id in lesson_ids:
+            key = self.locations.pop(lesson_id, None)
+            if key is not None:
+                grouped.setdefault(key, []).append(vector_id(lesson_id))
+
+        removed = 0
+        for key, ids in grouped.items():
+            index = self._writable(key)
+            drop_ids = np.array(ids, dtype=np.int64)
+            if self._removes_in_place(index):
+                removed += index.remove_ids(drop_ids)
+                self._drop_rerank(key, drop_ids)
+            else:
+                # HNSW cannot delete at all, and IVF reorders its lists on
+                # removal behind IDMap2's back: rebuild from the kept vectors
+                before = index.ntotal
+                self._rebuild(key, drop_ids=drop_ids)
+                removed += before - self.partitions[key].ntotal
+            for vid in ids:
+                self.doc_maps[key].pop(vid, None)
+            if not self.doc_maps[key]:
+                del self.partitions[key]
+                del self.doc_maps[key]
+                self.rerank.pop(key, None)
+            self._dirty.add(key)
+        return removed
+
+    def _read_doc_map(self) -> tuple[int, dict[str, dict[int, str]], Any, Any]:
+        with np.load(self.map_path) as data:
+            header = json.loads(data["header"].tobytes().decode("utf-8"))
+            if header.get("version") not in READABLE_DOC_MAP_VERSIONS:
+                raise ValueError(f"Unsupported doc_map version {header.get('version')}")
+            projection = data["projection"] if "projection" in data.files else None
+            rotation = data["rotation"] if "rotation" in data.files else None
+            doc_maps = {}
+            for i, key in enumerate(header["partitions"]):
+                ids = data[f"ids_{i}"].tolist()
+                names = data[f"names_{i}"].tobytes().decode("utf-8").split("\x00")
+                doc_maps[key] = dict(zip(ids, names))
+        return header["dim"], doc_maps, projection, rotation
+
+    def _write_doc_map(self, path: Path):
+        keys = list(self.doc_maps)
+        header = {"version": DOC_MAP_VERSION, "dim": self.dim, "partitions": keys}
+        arrays = {"header": np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)}
+        for i, key in enumerate(keys):
+            docs = self.doc_maps[key]
+            arrays[f"ids_{i}"] = np.fromiter(docs.keys(), dtype=np.int64, count=len(docs))
+            arrays[f"names_{i}"] = np.frombuffer("\x00".join(docs.values()).encode("utf-8"), dtype=np.uint8)
+        if self.projection is not None:
+            arrays["projection"] = self.projection
+        if self.rotation is not None:
+            arrays["rotation"] = self.rotation
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    def save(self):
+        """
+        Write changed partitions, then the doc_map sidecar
+
+        Every file is replaced atomically and the doc_map goes last, so it
+        only ever references partitions that are already on disk.
+        """
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        if self.reduce_dim and self.projection is None and self.ntotal >= PROJECTION_MIN_VECTORS:
+            self._train_projection()
+        for key in self._dirty:
+            index_path = self.index_dir / _partition_filename(key)
+            rerank_paths = [self.index_dir / name for name in _rerank_filenames(key)]
+            if key in self.partitions:
+                # Train the configured index type once the partition is big enough
+                index = self.partitions[key]
+                if self._is_staging(index) and index.ntotal >= MIN_TRAIN_VECTORS[self.index_type]:
+                    self._rebuild(key)
+                    index = self.partitions[key]
+                # The re-scoring store goes first, so a binary partition on disk always has one
+                for path, array in zip(rerank_paths, self.rerank.get(key, ())):
+                    _atomic_write_bytes(path, lambda p: _save_npy(p, array))
+                _atomic_write_bytes(index_path, lambda p: faiss.write_index(index, str(p)))
+                if key not in self.rerank:
+                    for path in rerank_paths:
+                        path.unlink(missing_ok=True)
+
+        _atomic_write_bytes(self.map_path, self._write_doc_map)
+
+        # Drop files of partitions that were emptied
+        for key in self._dirty - set(self.partitions):
+            for name in (_partition_filename(key), *_rerank_filenames(key)):
+                (self.index_dir / name).unlink(missing_ok=True)
+        self._dirty.clear()
+
+    def eligible_partitions(self, grade: int, subject: str | None, lang: str | None) -> list[str]:
+        """Partitions a query may search: grade ± 1 plus optional subject/lang"""
+        keys = []
+        for key in self.partitions:
+            part_grade, part_subject, part_lang = _split_key(key)
+            if abs(part_grade - grade) > 1:
+                continue
+            if subject and part_subject != subject:
+                continue
+            if lang and part_lang != lang:
+                continue
+            keys.append(key)
+        return keys
+
+    def partition_vectors(self, key: str) -> tuple[list[dict[str, Any]], Any]:
+        """
+        Documents and their vectors in one partition (decoded, so approximate
+        for quantized index types and projected stores)
+
+        Returns:
+            (docs with lesson_id, grade, subject and lang; array of shape (len(docs), dim))
+        """
+        index = self.partitions[key]
+        if index.ntotal == 0:
+            return [], np.zeros((0, self.dim), dtype=np.float32)
+        ids, vectors = self._stored_vectors(key)
+        if self.projection is not None:
+            vectors = vectors @ self.projection.T  # Back to embedding space (within the kept subspace)
+
+        grade, subject, lang = _split_key(key)
+        docs, rows = [], []
+        for row, vid in enumerate(ids):
+            lesson_id = self.doc_maps[key].get(int(vid))
+            if lesson_id is not None:
+                docs.append({"lesson_id": lesson_id, "grade": grade, "subject": subject, "lang": lang})
+                rows.append(row)
+        return docs, vectors[rows]
+
+    def search(
+        self, query_embedding, grade: int, subject: str | None, lang: str | None, top_k: int
+    ) -> list[tuple[dict[str, Any], float]]:
+        """
+        Search only the eligible partitions and merge by score
+
+        Returns:
+            Up to top_k (doc, score) pairs, all matching the filters
+        """
+        return self.search_batch([query_embedding], grade, subject, lang, top_k)[0]
+
+    def search_batch(
+        self, query_embeddings, grade: int, subject: str | None, lang: str | None, top_k: int
+    ) -> list[list[tuple[dict[str, Any], float]]]:
+        """
+        search() for several queries with the same filters, one FAISS call per partition
+
+        Returns:
+            Per query, up to top_k (doc, score) pairs
+        """
+        queries = self._project(np.vstack([np.asarray(q, dtype=np.float32).reshape(1, -1) for q in query_embeddings]))
+
+        hits: list[list[tuple[dict[str, Any], float]]] = [[] for _ in range(len(queries))]
+        eligible = self.eligible_partitions(grade, subject, lang)
+        # Binary partitions share one candidate budget in proportion to their size
+        binary_total = sum(self.partitions[key].ntotal for key in eligible if key in self.rerank)
+        for key in eligible:
+            index = self.partitions[key]
+            if index.ntotal == 0:
+                continue
+            if key in self.rerank:
+                share = math.ceil(top_k * self.rerank_factor * index.ntotal / binary_total)
+                scores, indices = self._rescore(key, queries, min(max(top_k, share), index.ntotal), top_k)
+            else:
+                scores, indices = index.search(queries, min(top_k, index.ntotal))
+            part_grade, part_subject, part_lang = _split_key(key)
+            docs = self.doc_maps[key]
+            for row, (row_scores, row_ids) in enumerate(zip(scores, indices)):
+                for score, vid in zip(row_scores, row_ids):
+                    lesson_id = docs.get(int(vid))
+                    if lesson_id is not None:
+                        doc = {"lesson_id": lesson_id, "grade": part_grade, "subject": part_subject, "lang": part_lang}
+                        hits[row].append((doc, float(score)))
+
+        for row_hits in hits:
+            row_hits.sort(key=lambda hit: hit[1], reverse=True)
+            del row_hits[top_k:]
+        return hits
+
+    def _rescore(self, key: str, queries, candidates: int, top_k: int):
+        """
+        Binary partition search: Hamming scan for candidates, then exact inner
+        products against their float16 vectors
+
+        Returns:
+            (scores, ids) arrays shaped like Index.search() output (-1 pads missing hits)
+        """
+        _, candidate_ids = self.partitions[key].search(self._rotate(queries), candidates)
+        sorted_ids, vectors = self.rerank[key]
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        for row, found in enumerate(candidate_ids):
+            found = found[found >= 0]
+            if not len(found):
+                continue
+            # Only the candidates' rows are read (and paged in when memory-mapped)
+            exact = np.asarray(vectors[np.searchsorted(sorted_ids, found)], dtype=np.float32) @ queries[row]
+            best = np.argsort(-exact)[:top_k]
+            scores[row, :len(best)] = exact[best]
+            ids[row, :len(best)] = found[best]
+        return scores, ids
@@ -1,5 +1,37 @@
 from __future__ import annotations
 
 
+# Tamil Unicode block (letters, vowel signs and pulli)
+TAMIL_RANGE = (0x0B80, 0x0BFF)
+
+# Share of a query's letters one script needs before the query counts as that language
+SCRIPT_MAJORITY = 0.8
+
+
 def pick_lang(text_ta: str, text_en: str, lang: str) -> str:
     return text_ta if lang == "ta" else text_en
+
+
+def detect_script(text: str) -> str | None:
+    """
+    Language of a query from the Unicode script of its letters
+
+    Returns "ta" for Tamil script, "en" for Latin script, or None when the
+    text is mixed (e.g. Tamil with English terms) or has no letters.
+    """
+    tamil = latin = 0
+    for ch in text:
+        code = ord(ch)
+        if TAMIL_RANGE[0] <= code <= TAMIL_RANGE[1]:
+            tamil += 1
+        elif ch.isascii() and ch.isalpha():
+            latin += 1
+
+    letters = tamil + latin
+    if not letters:
+        return None
+    if tamil >= SCRIPT_MAJORITY * letters:
+        return "ta"
+    if latin >= SCRIPT_MAJORITY * letters:
+        return "en"
+    return None
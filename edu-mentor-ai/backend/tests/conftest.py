@@ -0,0 +1,48 @@
+"""
+Shared fixtures: every test gets a scratch RAG data directory and the offline
+hash embedder, so no model download or real knowledge.db is touched
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Configure before app modules are imported (they read RAG_* at import time)
+os.environ.setdefault("RAG_DATA_DIR", tempfile.mkdtemp(prefix="edu-mentor-test-"))
+os.environ.setdefault("RAG_EMBEDDER", "hash")
+os.environ.setdefault("RAG_QUERY_CACHE_PERSIST", "0")
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point the RAG engine's storage paths at an empty directory"""
+    from app.services import rag_engine
+
+    paths = {
+        "DATA_DIR": tmp_path,
+        "DB_PATH": tmp_path / "knowledge.db",
+        "VECTOR_PATH": tmp_path / "vectors.faiss",
+        "VECTOR_DIR": tmp_path / "vectors",
+        "VECTOR_MAP_PATH": tmp_path / "vectors" / "docmap.npz",
+        "SECTION_VECTOR_DIR": tmp_path / "section_vectors",
+        "LEGACY_MAP_PATH": tmp_path / "vectors.json",
+    }
+    for name, value in paths.items():
+        monkeypatch.setattr(rag_engine, name, value)
+    return tmp_path
+
+
+@pytest.fixture
+def engine(data_dir):
+    """RAGEngine on the scratch directory (vector search on if FAISS is installed)"""
+    from app.services.rag_engine import RAGEngine
+
+    rag = RAGEngine(use_vectors=True)
+    yield rag
+    rag.close()
@@ -0,0 +1,41 @@
+"""ONNX int8 embedder parity with sentence-transformers (tools/embedder_benchmark.py)"""
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("onnxruntime")
+
+from app.services.embedders import ONNX_MODEL_FILE, create_embedder
+from app.services.rag_engine import EMBEDDING_MODEL, ONNX_MODEL_DIR
+from tools.embedder_benchmark import MIN_COSINE, REFERENCE_BACKEND, SAMPLE_QUERIES, parity
+
+SAMPLE_DOCS = [
+    "கூட்டல். இரண்டு எண்களைச் சேர்ப்பது கூட்டல் ஆகும். 2 + 3 = 5.",
+    "Addition. Putting two numbers together is called addition. 2 + 3 = 5.",
+    "தாவரத்தின் பாகங்கள். வேர், தண்டு, இலை, மலர் ஆகியவை தாவரத்தின் பாகங்கள்.",
+    "Parts of a plant. The root, stem, leaf and flower are the parts of a plant.",
+    "உயிர் எழுத்துகள். தமிழில் அ முதல் ஔ வரை 12 உயிர் எழுத்துகள் உள்ளன.",
+    "Animals and water. All animals need water to drink and to keep their bodies cool.",
+]
+
+
+def _vectors(backend: str) -> dict:
+    embedder = create_embedder(backend, EMBEDDING_MODEL, ONNX_MODEL_DIR)
+    return {
+        "docs": embedder.encode(SAMPLE_DOCS, normalize_embeddings=True),
+        "queries": embedder.encode(SAMPLE_QUERIES, normalize_embeddings=True),
+    }
+
+
+def test_onnx_matches_sentence_transformers():
+    if not (ONNX_MODEL_DIR / ONNX_MODEL_FILE).exists():
+        pytest.skip(f"No exported ONNX model in {ONNX_MODEL_DIR} (run tools/export_onnx_embedder.py)")
+    try:
+        reference = _vectors(REFERENCE_BACKEND)
+    except OSError as e:
+        pytest.skip(f"sentence-transformers model unavailable: {e}")
+
+    result = parity(reference, _vectors("onnx-int8"))
+
+    assert result["doc_cos_min"] >= MIN_COSINE
+    assert result["query_cos_min"] >= MIN_COSINE
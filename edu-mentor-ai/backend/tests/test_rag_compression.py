@@ -0,0 +1,37 @@
+"""Context compression: sentence scoring and its embedding cache"""
+
+from app.services.rag_engine import RAGResult
+
+
+def _result(lesson_id: str, content: str) -> RAGResult:
+    return RAGResult(
+        content=content, source=lesson_id, grade=3, subject="science",
+        relevance_score=1.0, snippet=content[:100],
+    )
+
+
+def test_sentence_embeddings_are_encoded_once(engine):
+    assert engine.vectors_ready and engine.embedding_store is not None
+    results = [_result("plants", "Plants need water. Roots hold the soil. Leaves make food from sunlight.")]
+
+    engine.compress_results("how do leaves make food", results, 200)
+    misses = engine.embedding_store.misses
+    assert misses == 3
+    compressed = engine.compress_results("why do plants need water", results, 200)
+
+    assert engine.embedding_store.misses == misses
+    assert compressed and "water" in compressed[0].content
+
+
+def test_fts_scoring_stays_inside_the_section(engine):
+    section = "Leaves make food from sunlight. Leaves are green."
+    content = "Roots take water from the soil. Water moves up the stem. " + section
+    engine.upsert_documents([{
+        "lesson_id": "plants", "grade": 3, "subject": "science", "lang": "en",
+        "title": "Plants", "content": content,
+    }])
+
+    scored = engine._score_sentences_fts("water for leaves", [_result("plants", section)])
+
+    assert [sentence for sentence, _ in scored[0]] == ["Leaves make food from sunlight.", "Leaves are green."]
+    assert all(score == 1.0 for _, score in scored[0])
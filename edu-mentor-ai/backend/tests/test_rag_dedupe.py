@@ -0,0 +1,59 @@
+"""Near-duplicate detection during upserts (rag_dedupe + RAGEngine.upsert_documents)"""
+
+import random
+
+WORDS = [
+    "plant", "root", "stem", "leaf", "flower", "water", "air", "sun", "animal", "food", "body", "light",
+    "heat", "soil", "bird", "rain", "energy", "seed", "river", "mountain", "village", "farmer", "season",
+    "cloud", "forest", "insect", "shadow", "stone", "sand", "wind", "fruit", "grain", "milk", "honey",
+]
+
+
+def _paragraphs(count: int, seed: int = 1) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(60)) + "." for _ in range(count)]
+
+
+def _chunks(paragraphs: list[str]) -> list[dict]:
+    """One lesson per paragraph, ids by position, as pdf_indexer names PDF chunks"""
+    return [
+        {"lesson_id": f"book_3_science_p{i:03d}", "grade": 3, "subject": "science", "lang": "en",
+         "title": f"Nature part {i + 1}", "content": text}
+        for i, text in enumerate(paragraphs)
+    ]
+
+
+def test_reindex_shifted_document_keeps_every_chunk(engine):
+    paragraphs = _paragraphs(10)
+    first = engine.upsert_documents(_chunks(paragraphs))
+    assert first["inserted"] == 10
+
+    # A paragraph added at the start shifts every chunk id by one
+    shifted = _chunks(_paragraphs(1, seed=99) + paragraphs)
+    stats = engine.upsert_documents(shifted)
+
+    assert stats["duplicates"] == 0
+    assert stats["inserted"] == 1 and stats["updated"] == 10
+    assert len(engine.document_ids("book_3_science_")) == 11
+    for chunk in shifted:
+        assert engine.get_lesson_by_id(chunk["lesson_id"])["content"] == chunk["content"]
+
+
+def test_duplicate_of_lesson_outside_batch_is_dropped(engine):
+    paragraphs = _paragraphs(2)
+    engine.upsert_documents(_chunks(paragraphs))
+
+    copy = {**_chunks(paragraphs)[0], "lesson_id": "other_book_p000", "title": "Copy"}
+    stats = engine.upsert_documents([copy])
+
+    assert stats["duplicates"] == 1
+    assert engine.get_lesson_by_id("other_book_p000") is None
+
+
+def test_duplicate_within_batch_keeps_first(engine):
+    text = _paragraphs(1)[0]
+    docs = _chunks([text, text])
+    stats = engine.upsert_documents(docs)
+
+    assert stats["inserted"] == 1 and stats["duplicates"] == 1
+    assert engine.get_lesson_by_id(docs[0]["lesson_id"]) is not None
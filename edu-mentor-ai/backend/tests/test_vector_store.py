@@ -0,0 +1,43 @@
+"""Removal and re-insertion across every vector index type"""
+
+import numpy as np
+import pytest
+
+from app.services.vector_store import INDEX_TYPES, PartitionedVectorStore, partition_key
+
+COUNT = 700  # Enough vectors for every quantized type to leave its flat staging index
+DIM = 384
+
+
+def _vectors():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(COUNT, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _docs():
+    return [{"lesson_id": f"l{i}", "grade": 3, "subject": "maths", "lang": "en"} for i in range(COUNT)]
+
+
+def _self_recall(store, vectors, ids) -> int:
+    return sum(store.search(vectors[i], 3, None, None, 1)[0][0]["lesson_id"] == f"l{i}" for i in ids)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_remove_then_upsert_keeps_recall(tmp_path, index_type):
+    vectors, docs = _vectors(), _docs()
+    store = PartitionedVectorStore(tmp_path, tmp_path / "docmap.npz", index_type=index_type)
+    store.upsert(docs, vectors)
+    store.save()
+    assert not store._is_staging(store.partitions[partition_key(3, "maths", "en")]) or index_type == "hnsw"
+
+    kept = range(1, COUNT, 2)
+    assert store.remove([f"l{i}" for i in range(0, COUNT, 2)]) == COUNT // 2
+    assert _self_recall(store, vectors, kept) == len(kept)
+
+    store.upsert(docs[1:3], vectors[1:3])
+    store.save()
+    reloaded = PartitionedVectorStore(tmp_path, tmp_path / "docmap.npz", index_type=index_type)
+    reloaded.load()
+    assert reloaded.ntotal == COUNT // 2 + 1
+    assert _self_recall(reloaded, vectors, kept) == len(kept)
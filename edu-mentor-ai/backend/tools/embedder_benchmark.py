@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Embedding backend parity check and benchmark
+
+Encodes the lesson corpus (indexing path) and single questions (query path)
+with each backend in its own process, then reports:
+- load time, indexing throughput, query latency p50/p95, peak RSS
+- parity against the sentence-transformers vectors (cosine, top-3 agreement)
+
+Exits non-zero if a backend's vectors drift below --min-cosine, so it can be
+used as a check after re-exporting the ONNX model.
+
+Usage:
+    python tools/embedder_benchmark.py
+    python tools/embedder_benchmark.py --backends onnx-int8 --no-parity
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from app.services.embedders import EMBEDDER_BACKENDS, create_embedder
+from app.services.rag_engine import (
+    CONTENT_DIR, EMBEDDING_MODEL, LESSON_DIR, ONNX_MODEL_DIR, _normalize_lesson, load_lesson_files
+)
+
+REFERENCE_BACKEND = "sentence-transformers"
+MIN_COSINE = 0.98  # Default parity threshold vs the reference backend
+
+SAMPLE_QUERIES = [
+    "கூட்டல் என்றால் என்ன?",
+    "What is addition?",
+    "தாவரத்தின் பாகங்கள் யாவை?",
+    "Parts of a plant",
+    "உயிர் எழுத்துகள் எத்தனை?",
+    "How many vowels are in Tamil?",
+    "நீர் ஏன் முக்கியம்?",
+    "Why do animals need water?",
+    "பெருக்கல் அட்டவணை",
+    "What is a noun?",
+]
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def corpus_texts() -> list[str]:
+    lessons = load_lesson_files([CONTENT_DIR, LESSON_DIR])
+    return [r["text"] for r in map(_normalize_lesson, lessons) if r["text"]]
+
+
+def run_worker(backend: str, out_path: Path, batch_size: int, repeats: int, model: str, onnx_dir: Path):
+    """Benchmark one backend in this process and write vectors + metrics to out_path"""
+    texts = corpus_texts()
+    queries = SAMPLE_QUERIES + [text.split(".")[0] for text in texts[:20]]
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    embedder = create_embedder(backend, model, onnx_dir)
+    load_seconds = time.perf_counter() - start
+    embedder.encode(["warmup"], normalize_embeddings=True)
+
+    # Indexing path: whole corpus in batches
+    start = time.perf_counter()
+    doc_vectors = embedder.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    index_seconds = time.perf_counter() - start
+
+    # Query path: one question at a time, as in retrieve()
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            embedder.encode([query], normalize_embeddings=True)
+            latencies.append((time.perf_counter() - start) * 1000)
+    query_vectors = embedder.encode(queries, normalize_embeddings=True)
+
+    latencies.sort()
+    metrics = {
+        "backend": backend,
+        "docs": len(texts),
+        "load_s": round(load_seconds, 2),
+        "index_docs_per_s": round(len(texts) / index_seconds, 1) if index_seconds else None,
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "rss_before_mb": round(rss_before, 1) if rss_before else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1) if peak_rss_mb() else None,
+    }
+    np.savez(out_path, docs=doc_vectors, queries=query_vectors, metrics=json.dumps(metrics))
+
+
+def parity(reference: dict, candidate: dict) -> dict:
+    """Cosine agreement and top-3 retrieval overlap between two backends"""
+    doc_cos = np.sum(reference["docs"] * candidate["docs"], axis=1)
+    query_cos = np.sum(reference["queries"] * candidate["queries"], axis=1)
+
+    k = min(3, len(reference["docs"]))
+    ref_top = np.argsort(-reference["queries"] @ reference["docs"].T, axis=1)[:, :k]
+    cand_top = np.argsort(-candidate["queries"] @ candidate["docs"].T, axis=1)[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(ref_top.tolist(), cand_top.tolist())]
+
+    return {
+        "doc_cos_mean": float(doc_cos.mean()),
+        "doc_cos_min": float(doc_cos.min()),
+        "query_cos_min": float(query_cos.min()),
+        "top3_overlap": float(np.mean(overlap)),
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark and parity-check embedding backends")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="SentenceTransformer model id")
+    parser.add_argument("--onnx-dir", type=Path, default=ONNX_MODEL_DIR, help="Exported ONNX model directory")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDER_BACKENDS), choices=EMBEDDER_BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the query set")
+    parser.add_argument("--min-cosine", type=float, default=MIN_COSINE, help="Parity threshold vs sentence-transformers")
+    parser.add_argument("--no-parity", action="store_true", help="Only report speed and memory")
+    parser.add_argument("--worker", choices=EMBEDDER_BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--out", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.out, args.batch_size, args.repeats, args.model, args.onnx_dir)
+        return
+
+    backends = list(args.backends)
+    if not args.no_parity and REFERENCE_BACKEND not in backends:
+        backends.insert(0, REFERENCE_BACKEND)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            out_path = Path(tmp) / f"{backend}.npz"
+            print(f"⏱️  Benchmarking {backend}...")
+            # Separate process per backend so peak RSS is not shared
+            proc = subprocess.run([
+                sys.executable, __file__, "--worker", backend, "--out", str(out_path),
+                "--batch-size", str(args.batch_size), "--repeats", str(args.repeats),
+                "--model", args.model, "--onnx-dir", str(args.onnx_dir),
+            ], env=os.environ.copy())
+            if proc.returncode != 0 or not out_path.exists():
+                print(f"   ❌ {backend} failed")
+                continue
+            with np.load(out_path) as data:
+                results[backend] = {
+                    "docs": data["docs"],
+                    "queries": data["queries"],
+                    "metrics": json.loads(str(data["metrics"])),
+                }
+
+    print("\n" + "=" * 60)
+    for backend, result in results.items():
+        print(json.dumps(result["metrics"], ensure_ascii=False))
+
+    failed = False
+    if not args.no_parity and REFERENCE_BACKEND in results:
+        reference = results[REFERENCE_BACKEND]
+        for backend, result in results.items():
+            if backend == REFERENCE_BACKEND:
+                continue
+            report = parity(reference, result)
+            ok = report["doc_cos_min"] >= args.min_cosine and report["query_cos_min"] >= args.min_cosine
+            failed = failed or not ok
+            print(f"{'✅' if ok else '❌'} parity {backend}: " + ", ".join(f"{k}={v:.4f}" for k, v in report.items()))
+
+    if failed or len(results) < len(backends):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
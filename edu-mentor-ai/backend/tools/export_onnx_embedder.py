@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Export the multilingual MiniLM embedding model to int8-quantized ONNX
+Run once on a machine with torch + transformers; the result runs on ONNX Runtime only
+
+Usage:
+    pip install torch transformers onnx onnxscript onnxruntime
+    python tools/export_onnx_embedder.py
+    RAG_EMBEDDER=onnx-int8 uvicorn app.main:app
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.rag_engine import EMBEDDING_MODEL, ONNX_MODEL_DIR
+from app.services.embedders import ONNX_MODEL_FILE
+
+
+def export(model_name: str, out_dir: Path, opset: int = 17):
+    """Export model_name to out_dir/model.onnx (int8 weights) plus tokenizer.json"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"📦 Loading {model_name}")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    dummy = tokenizer(["கூட்டல் என்றால் என்ன?", "What is addition?"], padding=True, return_tensors="pt")
+    with tempfile.TemporaryDirectory() as tmp:
+        # float32 graph (and any external weight files) only live in the temp dir
+        fp32_path = Path(tmp) / "model_fp32.onnx"
+        print("🔨 Exporting ONNX graph")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (dummy["input_ids"], dummy["attention_mask"]),
+                str(fp32_path),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=opset,
+            )
+
+        print("🗜️ Quantizing weights to int8")
+        quantize_dynamic(str(fp32_path), str(out_dir / ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+
+    # Writes tokenizer.json (fast tokenizer) used by the tokenizers library at runtime
+    tokenizer.save_pretrained(str(out_dir))
+
+    size_mb = (out_dir / ONNX_MODEL_FILE).stat().st_size / 1e6
+    print(f"✅ Exported {ONNX_MODEL_FILE} ({size_mb:.0f} MB) to {out_dir}")
+    print("💡 Check parity with: python tools/embedder_benchmark.py")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the embedding model to int8 ONNX")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="SentenceTransformer model id")
+    parser.add_argument("--out", type=Path, default=ONNX_MODEL_DIR, help="Output directory")
+    args = parser.parse_args()
+
+    export(args.model, args.out)
+
+
+if __name__ == "__main__":
+    main()
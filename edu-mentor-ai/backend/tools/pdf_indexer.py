@@ -138,8 +138,9 @@ def index_pdf(
     lesson_title = title or pdf_path.stem
     
     # Create lesson entries for each chunk
+    lessons = []
     for i, chunk in enumerate(chunks):
-        lesson = {
+        lessons.append({
             "lesson_id": f"{pdf_path.stem}_chunk_{i}",
             "grade": grade,
             "subject": subject,
@@ -150,15 +151,25 @@ def index_pdf(
             "keywords": extract_keywords(chunk, lang),
             "difficulty": "medium",
             "source": str(pdf_path.name)
-        }
-        
-        # Index into RAG
-        rag.index_content([lesson])
-        
-        if (i + 1) % 10 == 0:
-            print(f"   ⏳ Indexed {i+1}/{len(chunks)} chunks...")
-    
-    print(f"   ✅ Successfully indexed {len(chunks)} chunks from {pdf_path.name}")
+        })
+    
+    # Index all chunks into RAG in one batch (single embedding pass + index write)
+    stats = rag.upsert_documents(lessons)
+    
+    # Drop chunks left over from a previous, longer version of this PDF
+    current_ids = {lesson["lesson_id"] for lesson in lessons}
+    stale_ids = [
+        lesson_id for lesson_id in rag.document_ids(prefix=f"{pdf_path.stem}_chunk_")
+        if lesson_id not in current_ids
+    ]
+    if stale_ids:
+        rag.delete_documents(stale_ids)
+    
+    print(
+        f"   ✅ Successfully indexed {len(chunks)} chunks from {pdf_path.name} "
+        f"({stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+        f"{stats['duplicates']} near-duplicates dropped)"
+    )
 
 
 def extract_keywords(text: str, lang: str) -> list[str]:
@@ -220,6 +231,12 @@ def main():
         index_directory(args.path, args.grade, args.subject, args.lang)
     else:
         print(f"❌ Invalid path: {args.path}")
+        return
+    
+    # Refresh the precomputed related-lessons table for the new chunks
+    linked = get_rag_engine(use_vectors=True).build_related()
+    if linked:
+        print(f"🔗 Stored related lessons for {linked} lessons")
 
 
 if __name__ == "__main__":
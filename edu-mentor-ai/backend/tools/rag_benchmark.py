@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+RAG retrieval benchmark on synthetic Tamil/English corpora
+
+Generates lesson corpora in the content/class_*/<subject>.json shape
+(1k / 10k / 100k chunks by default), indexes each one into a scratch
+RAG_DATA_DIR and measures RAGEngine.retrieve() for the vector, keyword and
+hybrid methods:
+- indexing time and docs/s, knowledge.db and vector partition size
+- query latency p50/p95/p99, queries/s, peak RSS, and the RSS growth of
+  serving queries from an engine reloaded from disk (memory-mapped partitions
+  only count the pages the queries touched)
+- vector recall@k of each approximate index type (and each --pca-dims
+  projection) against the full-dimensional flat run of the same corpus
+  (exact search, so its hits are the ground truth)
+
+Every (corpus size, index type) runs in its own process so module-level
+config (RAG_INDEX_TYPE, RAG_EMBEDDER, ...) and RSS are isolated. Runs fully
+offline with --embedder hash (feature hashing stand-in, the default).
+
+Usage:
+    python tools/rag_benchmark.py --sizes 1000 10000 --save baseline.json
+    python tools/rag_benchmark.py --sizes 1000 10000 --compare baseline.json
+    python tools/rag_benchmark.py --sizes 1000 --index-types flat sq8 hnsw --embedder sentence-transformers
+    python tools/rag_benchmark.py --sizes 100000 --index-types flat binary
+    python tools/rag_benchmark.py --sizes 10000 --index-types flat fp16 --pca-dims 0 128 192
+"""
+
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+METHODS = ("vector", "keyword", "hybrid")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# Subject vocabularies: (Tamil words, English words)
+VOCABULARY = {
+    "maths": (
+        ["கூட்டல்", "கழித்தல்", "பெருக்கல்", "வகுத்தல்", "எண்", "பின்னம்", "வட்டம்", "சதுரம்",
+         "முக்கோணம்", "அளவு", "நீளம்", "எடை", "நேரம்", "பணம்", "இடமதிப்பு", "கணக்கு"],
+        ["addition", "subtraction", "multiplication", "division", "number", "fraction", "circle", "square",
+         "triangle", "measure", "length", "weight", "time", "money", "place", "value", "sum", "total"],
+    ),
+    "science": (
+        ["தாவரம்", "வேர்", "தண்டு", "இலை", "மலர்", "நீர்", "காற்று", "சூரியன்", "விலங்கு",
+         "உணவு", "உடல்", "ஒளி", "வெப்பம்", "மண்", "பறவை", "மழை"],
+        ["plant", "root", "stem", "leaf", "flower", "water", "air", "sun", "animal", "food",
+         "body", "light", "heat", "soil", "bird", "rain", "energy", "seed"],
+    ),
+    "tamil": (
+        ["உயிர்", "மெய்", "எழுத்து", "சொல்", "வாக்கியம்", "பாடல்", "கதை", "பெயர்ச்சொல்",
+         "வினைச்சொல்", "திருக்குறள்", "பழமொழி", "இலக்கணம்", "கவிதை", "ஒலி", "பொருள்", "வாசிப்பு"],
+        ["vowel", "consonant", "letter", "word", "sentence", "song", "story", "noun", "verb",
+         "couplet", "proverb", "grammar", "poem", "sound", "meaning", "reading"],
+    ),
+    "english": (
+        ["ஆங்கிலம்", "எழுத்து", "சொல்", "வாக்கியம்", "கதை", "பாடல்", "உரையாடல்", "வாசிப்பு"],
+        ["alphabet", "word", "sentence", "story", "rhyme", "noun", "verb", "adjective", "article",
+         "tense", "plural", "spelling", "reading", "writing", "conversation", "letter"],
+    ),
+    "social": (
+        ["குடும்பம்", "பள்ளி", "கிராமம்", "நகரம்", "நாடு", "மாநிலம்", "வரைபடம்", "திசை",
+         "விழா", "உழவர்", "போக்குவரத்து", "தொழில்", "ஆறு", "மலை", "கடல்", "வரலாறு"],
+        ["family", "school", "village", "city", "country", "state", "map", "direction", "festival",
+         "farmer", "transport", "occupation", "river", "mountain", "sea", "history"],
+    ),
+}
+FILLER = (
+    ["என்பது", "மற்றும்", "ஒரு", "இது", "நாம்", "பற்றி", "கற்போம்", "உதாரணம்", "எப்படி", "ஏன்"],
+    ["is", "and", "a", "the", "we", "about", "learn", "example", "how", "why", "of", "to"],
+)
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> float | None:
+    """Resident set size of this process right now (Linux only)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def _sentence(rng: random.Random, words: list[str], filler: list[str]) -> str:
+    picked = rng.sample(words, k=min(len(words), rng.randint(3, 6))) + rng.sample(filler, k=3)
+    rng.shuffle(picked)
+    return " ".join(picked).capitalize() + "."
+
+
+def generate_corpus(size: int, out_dir: Path, seed: int = 42) -> Path:
+    """
+    Write `size` synthetic lesson chunks as out_dir/class_<grade>/<subject>.json
+
+    Half the chunks are Tamil and half English. Content length (~300-1000
+    characters) matches the PDF chunks produced by pdf_indexer.py.
+    """
+    rng = random.Random(seed)
+    files: dict[tuple[int, str], list[dict]] = {}
+
+    for i in range(size):
+        grade = rng.randint(0, 7)
+        subject = rng.choice(list(VOCABULARY))
+        lang = "ta" if i % 2 == 0 else "en"
+        words = VOCABULARY[subject][0 if lang == "ta" else 1]
+        filler = FILLER[0 if lang == "ta" else 1]
+
+        sentences = []
+        target_chars = rng.randint(300, 1000)
+        while sum(len(s) + 1 for s in sentences) < target_chars:
+            sentences.append(_sentence(rng, words, filler))
+
+        title_words = rng.sample(words, k=2)
+        files.setdefault((grade, subject), []).append({
+            "lesson_id": f"bench_{subject[:2]}_{grade}_{i:06d}",
+            "grade": grade,
+            "subject": subject,
+            "title": " ".join(title_words),
+            "lang": lang,
+            "summary": sentences[0],
+            "keywords": " ".join(rng.sample(words, k=4)),
+            "content": " ".join(sentences),
+        })
+
+    for (grade, subject), items in files.items():
+        path = out_dir / f"class_{grade}" / f"{subject}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"items": items}, ensure_ascii=False), encoding="utf-8")
+
+    return out_dir
+
+
+def sample_queries(lessons: list[dict], count: int, seed: int = 7) -> list[dict]:
+    """Questions built from corpus vocabulary, with the grade/subject/lang a student would send"""
+    rng = random.Random(seed)
+    queries = []
+    for lesson in rng.sample(lessons, k=min(count, len(lessons))):
+        words = lesson["content"].rstrip(".").split()
+        start = rng.randrange(max(1, len(words) - 3))
+        queries.append({
+            "query": " ".join(words[start:start + rng.randint(1, 3)]),
+            "grade": lesson["grade"],
+            "subject": lesson["subject"] if rng.random() < 0.5 else None,
+            "lang": lesson["lang"],
+        })
+    return queries
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _size_mb(paths) -> float:
+    return sum(p.stat().st_size for p in paths if p.is_file()) / 1e6
+
+
+def run_worker(corpus_dir: Path, out_path: Path, queries: int, repeats: int, top_k: int):
+    """Index the corpus and benchmark retrieve(); config comes from the RAG_* environment"""
+    from app.services import rag_engine
+    from app.services.rag_engine import RAGEngine, load_lesson_files
+
+    lessons = load_lesson_files([corpus_dir])
+    rss_start = peak_rss_mb()
+
+    engine = RAGEngine(use_vectors=True)
+    start = time.perf_counter()
+    stats = engine.upsert_documents(lessons)
+    index_seconds = time.perf_counter() - start
+
+    workload = sample_queries(lessons, queries)
+    results = {
+        "docs": len(lessons),
+        "index_type": rag_engine.RAG_INDEX_TYPE,
+        "pca_dim": rag_engine.RAG_INDEX_PCA_DIM,
+        "embedder": rag_engine.RAG_EMBEDDER,
+        "vectors_enabled": engine.use_vectors,
+        "index_s": round(index_seconds, 2),
+        "indexed": stats["inserted"] + stats["updated"],
+        "index_docs_per_s": round((stats["inserted"] + stats["updated"]) / index_seconds, 1) if index_seconds else None,
+        # knowledge.db plus its WAL file (not checkpointed yet right after indexing)
+        "db_mb": round(_size_mb(rag_engine.DB_PATH.parent.glob(rag_engine.DB_PATH.name + "*")), 2),
+        "vectors_mb": round(_size_mb([*rag_engine.VECTOR_DIR.rglob("*"), *rag_engine.SECTION_VECTOR_DIR.rglob("*")]), 2),
+        # Partitions below MIN_TRAIN_VECTORS stay flat whatever the index type
+        "partitions": len(engine.vectors.partitions),
+        "flat_partitions": engine.vectors.staging_partitions,
+        "methods": {},
+        "vector_ids": [],
+    }
+
+    # Serve queries from a fresh engine that loads the index from disk, as a restarted backend would
+    engine.close()
+    del engine
+    gc.collect()
+    rss_serving = current_rss_mb()
+    engine = RAGEngine(use_vectors=True)
+
+    for method in METHODS:
+        if method != "keyword" and not engine.use_vectors:
+            continue
+        # Warm statement caches and page in the index before timing
+        for item in workload[:10]:
+            engine.retrieve(item["query"], item["grade"], item["subject"], item["lang"], top_k, method)
+
+        latencies = []
+        hits = 0
+        wall_start = time.perf_counter()
+        for repeat in range(repeats):
+            for item in workload:
+                start = time.perf_counter()
+                found = engine.retrieve(item["query"], item["grade"], item["subject"], item["lang"], top_k, method)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += bool(found)
+                if method == "vector" and repeat == 0:
+                    results["vector_ids"].append([hit.source for hit in found])
+        wall_seconds = time.perf_counter() - wall_start
+
+        latencies.sort()
+        results["methods"][method] = {
+            "p50_ms": round(_percentile(latencies, 0.50), 3),
+            "p95_ms": round(_percentile(latencies, 0.95), 3),
+            "p99_ms": round(_percentile(latencies, 0.99), 3),
+            "qps": round(len(latencies) / wall_seconds, 1) if wall_seconds else None,
+            "answered": round(hits / len(latencies), 3),
+        }
+
+    rss = peak_rss_mb()
+    if rss_serving is not None:
+        results["serving_rss_mb"] = round(current_rss_mb() - rss_serving, 1)
+    results["rss_start_mb"] = round(rss_start, 1) if rss_start else None
+    results["peak_rss_mb"] = round(rss, 1) if rss else None
+    engine.close()
+    out_path.write_text(json.dumps(results), encoding="utf-8")
+
+
+def recall_at_k(results: list[list[str]], truth: list[list[str]]) -> float | None:
+    """Share of the exact (flat) hits that an approximate index also returned"""
+    expected = sum(len(ids) for ids in truth)
+    if not expected or len(results) != len(truth):
+        return None
+    found = sum(len(set(ids) & set(exact)) for ids, exact in zip(results, truth))
+    return round(found / expected, 3)
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> bool:
+    """Print latency deltas against a saved baseline; False if any p95 regressed too far"""
+    ok = True
+    for key, result in current.items():
+        base = baseline.get(key)
+        if not base:
+            print(f"   {key}: no baseline")
+            continue
+        for method, metrics in result["methods"].items():
+            base_metrics = base["methods"].get(method)
+            if not base_metrics or not base_metrics["p95_ms"]:
+                continue
+            change = metrics["p95_ms"] / base_metrics["p95_ms"] - 1
+            regressed = change > max_regression
+            ok = ok and not regressed
+            print(
+                f"{'❌' if regressed else '✅'} {key} {method:<7} p95 "
+                f"{base_metrics['p95_ms']:.2f} → {metrics['p95_ms']:.2f} ms ({change:+.0%})"
+            )
+    return ok
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark RAGEngine.retrieve() on synthetic corpora")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="Corpus sizes (chunks)")
+    parser.add_argument("--index-types", nargs="+", default=["flat"], help="RAG_INDEX_TYPE values to compare")
+    parser.add_argument("--pca-dims", nargs="+", type=int, default=[0], help="RAG_INDEX_PCA_DIM values (0 = full)")
+    parser.add_argument("--embedder", default="hash", help="RAG_EMBEDDER backend (hash needs no model)")
+    parser.add_argument("--queries", type=int, default=200, help="Distinct queries per run")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the query set")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--cached", action="store_true", help="Keep query/result caches on (default: measure misses)")
+    parser.add_argument("--work-dir", type=Path, help="Keep corpora and indexes here and reuse them across runs")
+    parser.add_argument("--save", type=Path, help="Write results as a baseline JSON file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 slowdown vs baseline")
+    parser.add_argument("--worker", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--out", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.out, args.queries, args.repeats, args.top_k)
+        return
+
+    scratch = tempfile.TemporaryDirectory() if args.work_dir is None else None
+    work_dir = Path(scratch.name) if scratch else args.work_dir
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    try:
+        for size in args.sizes:
+            corpus_dir = work_dir / f"corpus_{size}"
+            if not corpus_dir.exists():
+                print(f"📝 Generating {size} synthetic lessons...")
+                generate_corpus(size, corpus_dir)
+
+            for index_type, pca_dim in [(t, d) for t in args.index_types for d in args.pca_dims]:
+                variant = f"{index_type}+pca{pca_dim}" if pca_dim else index_type
+                key = f"{size}/{variant}/{args.embedder}"
+                data_dir = work_dir / f"index_{size}_{variant}_{args.embedder}"
+                data_dir.mkdir(parents=True, exist_ok=True)
+                out_path = work_dir / f"result_{size}_{variant}.json"
+
+                env = os.environ.copy()
+                env.update({
+                    "RAG_DATA_DIR": str(data_dir),
+                    "RAG_INDEX_TYPE": index_type,
+                    "RAG_INDEX_PCA_DIM": str(pca_dim),
+                    "RAG_EMBEDDER": args.embedder,
+                    "RAG_QUERY_CACHE_PERSIST": "0",
+                })
+                if not args.cached:
+                    env.update({"RAG_QUERY_CACHE_SIZE": "0", "RAG_RESULT_CACHE_SIZE": "0"})
+
+                print(f"⏱️  Benchmarking {key}...")
+                # Separate process per run so module config and peak RSS are not shared
+                proc = subprocess.run([
+                    sys.executable, __file__, "--worker", str(corpus_dir), "--out", str(out_path),
+                    "--queries", str(args.queries), "--repeats", str(args.repeats), "--top-k", str(args.top_k),
+                ], env=env, stdout=subprocess.DEVNULL)
+                if proc.returncode != 0 or not out_path.exists():
+                    print(f"   ❌ {key} failed")
+                    continue
+                results[key] = json.loads(out_path.read_text(encoding="utf-8"))
+                out_path.unlink()
+    finally:
+        if scratch:
+            scratch.cleanup()
+
+    vector_ids = {key: result.pop("vector_ids", []) for key, result in results.items()}
+    for key, result in results.items():
+        size, index_type, embedder = key.split("/")
+        truth = vector_ids.get(f"{size}/flat/{embedder}")
+        if index_type != "flat" and truth and "vector" in result["methods"]:
+            result["methods"]["vector"][f"recall@{args.top_k}"] = recall_at_k(vector_ids[key], truth)
+
+    print("\n" + "=" * 60)
+    for key, result in results.items():
+        print(json.dumps({"run": key, **result}, ensure_ascii=False))
+    from app.services.vector_store import MIN_TRAIN_VECTORS
+    for key, result in results.items():
+        if result.get("flat_partitions"):
+            print(
+                f"⚠️  {key}: {result['flat_partitions']} of {result['partitions']} partitions are below "
+                f"{MIN_TRAIN_VECTORS.get(result['index_type'])} vectors and stayed flat"
+            )
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"💾 Baseline saved to {args.save}")
+
+    failed = len(results) < len(args.sizes) * len(args.index_types) * len(args.pca_dims)
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        failed = not compare(results, baseline, args.max_regression) or failed
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()